@@ -1,18 +1,308 @@
 # destinations/api.py
-from rest_framework import routers, viewsets, permissions
-from .models import Destination, Spot
-from .serializers import DestinationSerializer, SpotSerializer
+import hashlib
+from decimal import Decimal, InvalidOperation
 
-class DestinationViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Destination.objects.prefetch_related('spots')
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rest_framework import pagination, routers, viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from . import facets, geo, search
+from .models import Destination, Offer, Spot
+from .pagination import InvalidCursor, keyset_page
+from .serializers import DestinationSerializer, OfferSerializer, SpotSerializer, parse_expand
+from .cache import catalog_version, pages
+
+class CachedReadMixin:
+    """Serve list/retrieve payloads from the two-tier page cache."""
+
+    def _cached(self, request, action, compute):
+        path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+        # The date keeps offer expiry (at midnight) from being cached over.
+        key = f'api:{self.basename}:{action}:{catalog_version()}:{timezone.localdate()}:{path}'
+        return Response(pages.get_or_compute(key, lambda: compute().data))
+
+    def get_serializer_context(self):
+        # No request: file fields render as MEDIA_URL-relative URLs, so a
+        # cached payload does not carry the host of whoever filled it.
+        context = super().get_serializer_context()
+        context.pop('request', None)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, 'list',
+                            lambda: super(CachedReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, 'detail',
+                            lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs))
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination on the view's ``keyset_ordering`` (see pagination.py).
+    ``?cursor=`` continues a listing, ``?page_size=`` picks the page size.
+    """
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            rows, self.next_cursor = keyset_page(
+                queryset, view.keyset_ordering,
+                request.query_params.get('cursor'), self.get_page_size(request),
+            )
+        except InvalidCursor:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        # Relative, so cached payloads do not depend on the host name.
+        return replace_query_param(self.request.get_full_path(), 'cursor', self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class ShapedViewSetMixin:
+    """
+    ``?fields=`` / ``?expand=`` support: passes the requested shape to the
+    serializer and prefetches exactly the relations it will render.
+    """
+
+    def _shape(self):
+        params = self.request.query_params
+        fields = [f for f in params.get('fields', '').split(',') if f] or None
+        expand = parse_expand(params.get('expand'))
+        meta = self.get_serializer_class().Meta
+        expandable = getattr(meta, 'expandable', {})
+        for param, names, known in (('fields', fields or [], set(meta.fields) | set(expandable)),
+                                    ('expand', expand, set(expandable))):
+            unknown = sorted(set(names) - known)
+            if unknown:
+                raise ValidationError({param: f"Unknown field(s): {', '.join(unknown)}."})
+        if fields:
+            expand = {name: sub for name, sub in expand.items() if name in fields}
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'], kwargs['expand'] = self._shape()
+        return super().get_serializer(*args, **kwargs)
+
+    def _prefetches(self, serializer_class, expand, prefix=''):
+        lookups = []
+        expandable = getattr(serializer_class.Meta, 'expandable', {})
+        for name, sub in expand.items():
+            if name in expandable:
+                lookups.append(prefix + name)
+                lookups += self._prefetches(expandable[name], sub, f'{prefix}{name}__')
+        return lookups
+
+    def get_queryset(self):
+        _, expand = self._shape()
+        lookups = self._prefetches(self.get_serializer_class(), expand)
+        return super().get_queryset().prefetch_related(*lookups)
+
+
+class DestinationViewSet(CachedReadMixin, ShapedViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Destination.objects.all()
     serializer_class = DestinationSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
-class SpotViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Spot.objects.with_related()
+class SpotViewSet(CachedReadMixin, ShapedViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Spot.objects.all()
     serializer_class = SpotSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    # Served by the unique (destination, name) index.
+    keyset_ordering = ('destination_id', 'name', 'id')
+
+    nearby_default_radius_km = 10
+    nearby_max_radius_km = 200
+    nearby_max_results = 100
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        destination = self.request.query_params.get('destination')
+        if destination:
+            queryset = queryset.filter(destination__slug=destination)
+        return queryset
+
+    def _float_param(self, name, low, high, default=None):
+        raw = self.request.query_params.get(name)
+        if raw in (None, ''):
+            if default is None:
+                raise ValidationError({name: 'This parameter is required.'})
+            return default
+        try:
+            value = float(raw)
+        except ValueError:
+            raise ValidationError({name: 'A number is required.'})
+        if not low <= value <= high:
+            raise ValidationError({name: f'Must be between {low} and {high}.'})
+        return value
+
+    @action(detail=False)
+    def nearby(self, request):
+        """
+        GET /api/spots/nearby/?lat=&lon=&radius=<km>&limit=
+        Spots within *radius* km, nearest first, each with ``distance_km``.
+        """
+        lat = self._float_param('lat', -90, 90)
+        lon = self._float_param('lon', -180, 180)
+        radius = self._float_param('radius', 0, self.nearby_max_radius_km,
+                                   default=self.nearby_default_radius_km)
+        limit = int(self._float_param('limit', 1, self.nearby_max_results,
+                                      default=KeysetPagination.page_size))
+
+        queryset = self.filter_queryset(self.get_queryset())
+        hits = geo.nearby(queryset.order_by(), lat, lon, radius, limit)
+        spots = queryset.in_bulk([spot_id for spot_id, _ in hits])
+        ordered = [spots[spot_id] for spot_id, _ in hits]
+        results = self.get_serializer(ordered, many=True).data
+        for row, (_, distance) in zip(results, hits):
+            row['distance_km'] = round(distance, 3)
+        return Response({'results': results})
+
+class OfferViewSet(CachedReadMixin, ShapedViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/offers/?destination=<slug>&type=hotel&from=YYYY-MM-DD&to=YYYY-MM-DD
+                    &min_price=&max_price=&include_expired=1
+    Cheapest first, keyset-paginated on (price, id). Only offers that have
+    not expired are listed unless ``include_expired`` is set.
+    """
+    queryset = Offer.objects.all()
+    serializer_class = OfferSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('price', 'id')
+
+    def _date_param(self, name):
+        raw = self.request.query_params.get(name)
+        if not raw:
+            return None
+        try:
+            value = parse_date(raw)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError({name: 'Use YYYY-MM-DD.'})
+        return value
+
+    def _price_param(self, name):
+        raw = self.request.query_params.get(name)
+        if not raw:
+            return None
+        try:
+            value = Decimal(raw)
+        except InvalidOperation:
+            raise ValidationError({name: 'A number is required.'})
+        if not value.is_finite() or value < 0:
+            raise ValidationError({name: 'Must be a non-negative number.'})
+        return value
+
+    def _scope(self, queryset):
+        params = self.request.query_params
+        if not params.get('include_expired'):
+            queryset = queryset.active()
+        if params.get('destination'):
+            queryset = queryset.filter(destination__slug=params['destination'])
+        return queryset
+
+    def _conditions(self):
+        """
+        The request's facet filters as {"type"|"month"|"price": Q}.
+        """
+        params = self.request.query_params
+        conditions = {'type': Q(), 'month': Q(), 'price': Q()}
+        if params.get('type'):
+            if params['type'] not in dict(Offer.TYPES):
+                raise ValidationError({'type': 'Unknown offer type.'})
+            conditions['type'] = Q(type=params['type'])
+
+        start, end = self._date_param('from'), self._date_param('to')
+        if start and end and start > end:
+            raise ValidationError({'to': 'Must not be before "from".'})
+        if start or end:
+            conditions['month'] = Q(available_from__lte=start or end,
+                                    available_to__gte=end or start)
+
+        low, high = self._price_param('min_price'), self._price_param('max_price')
+        if low is not None:
+            conditions['price'] &= Q(price__gte=low)
+        if high is not None:
+            conditions['price'] &= Q(price__lte=high)
+        return conditions
+
+    def filter_offers(self, queryset):
+        """
+        Apply the request's offer filters to *queryset*.
+        """
+        return self._scope(queryset).filter(*self._conditions().values())
+
+    def get_queryset(self):
+        return self.filter_offers(super().get_queryset())
+
+    @action(detail=False)
+    def facets(self, request):
+        """
+        GET /api/offers/facets/?<same filters as the listing>
+        Offer counts per type, price bucket and month (see facets.py).
+        """
+        conditions = self._conditions()
+        today = timezone.localdate()
+        params = request.query_params
+        signature = {
+            'include_expired': bool(params.get('include_expired')),
+            'destination': params.get('destination', ''),
+            **{name: str(condition) for name, condition in conditions.items()},
+        }
+        queryset = self._scope(Offer.objects.all())
+        return Response(facets.cached(signature, queryset, conditions, today))
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    GET /api/search/?q=&limit=
+    Ranked destinations, spots and offers; ``title_html`` and ``snippet``
+    are escaped HTML with matches wrapped in <mark>.
+    """
+    permission_classes = [permissions.AllowAny]
+    max_results = 100
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        try:
+            limit = int(request.query_params.get('limit', search.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'A whole number is required.'})
+        hits = search.search(query[:200], limit=max(1, min(limit, self.max_results)))
+        return Response({'results': [
+            {key: str(value) if key in ('title_html', 'snippet') else value
+             for key, value in hit.items() if key != 'id'}
+            for hit in hits
+        ]})
 
 router = routers.DefaultRouter()
 router.register('destinations', DestinationViewSet)
 router.register('spots', SpotViewSet)
+router.register('offers', OfferViewSet)
+router.register('search', SearchViewSet, basename='search')
@@ -0,0 +1,88 @@
+# destinations/cache.py
+"""
+Version-stamped caching for destination pages.
+
+Every destination has a version number in the cache. Cached fragments
+include it in their key, so bumping the version invalidates every fragment
+of that destination at once, with no key enumeration. Model signals call
+``invalidate_destination``. Inside a transaction the bumps are collected
+and applied once on commit, so a bulk admin edit costs one bump per
+destination instead of one per saved row.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from travel_site.cache import TwoTierCache
+
+VERSION_KEY = "dest-ver-{}"
+CATALOG_VERSION_KEY = "catalog-ver"
+FRAGMENT_TTL = getattr(settings, "DESTINATION_FRAGMENT_TTL", 60 * 60)
+
+# Computed page data (listing pages, API responses), keyed by version.
+pages = TwoTierCache("pages", ttl=FRAGMENT_TTL, local_ttl=5)
+
+_pending = threading.local()
+
+
+def _new_version() -> int:
+    # Unique even if the old version was evicted, unlike a plain counter.
+    return time.time_ns()
+
+
+def _version(key) -> int:
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def destination_version(destination_id) -> int:
+    return _version(VERSION_KEY.format(destination_id))
+
+
+def catalog_version() -> int:
+    """
+    Changes whenever any destination changes; keys cross-destination data.
+    """
+    return _version(CATALOG_VERSION_KEY)
+
+
+def bump_destination_version(destination_id):
+    cache.set_many({
+        VERSION_KEY.format(destination_id): _new_version(),
+        CATALOG_VERSION_KEY: _new_version(),
+    }, timeout=None)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, _new_version(), timeout=None)
+
+
+def _flush_pending():
+    ids = getattr(_pending, "ids", set())
+    _pending.ids = set()
+    for destination_id in ids:
+        bump_destination_version(destination_id)
+
+
+def invalidate_destination(destination_id):
+    """
+    Invalidate a destination's cached fragments, coalesced per transaction.
+    """
+    if destination_id is None:
+        return
+    if not transaction.get_connection().in_atomic_block:
+        bump_destination_version(destination_id)
+        return
+    # Registered on every call: a rolled-back block drops its callback, so
+    # the next commit must not rely on an earlier registration. Only the
+    # first callback to run finds ids left to bump.
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    _pending.ids.add(destination_id)
+    transaction.on_commit(_flush_pending)
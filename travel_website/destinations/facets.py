@@ -0,0 +1,104 @@
+# destinations/facets.py
+"""
+Facet counts for the offer filters: per type, per price bucket and per
+month of availability.
+
+All counts come from one aggregate query with one filtered COUNT per
+facet value. Facets are disjunctive: a facet's counts apply every
+selected filter except its own, so choosing "hotel" still shows how many
+boats match. The result is cached per filter signature and catalog
+version.
+"""
+import datetime
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .cache import catalog_version, pages
+from .models import Offer
+
+# Upper bounds of the price buckets; the last bucket is open-ended.
+PRICE_BUCKETS = [Decimal(str(b)) for b in
+                 getattr(settings, "OFFER_PRICE_BUCKETS", (50, 100, 250, 500, 1000))]
+MONTHS = 12
+
+
+def _months(today):
+    """
+    ``(first_day, last_day)`` of the MONTHS months starting with today's.
+    """
+    months = []
+    year, month = today.year, today.month
+    for _ in range(MONTHS):
+        first = datetime.date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        months.append((first, datetime.date(year, month, 1) - datetime.timedelta(days=1)))
+    return months
+
+
+def _price_buckets():
+    bounds = [Decimal(0)] + PRICE_BUCKETS
+    return [(low, high) for low, high in zip(bounds, PRICE_BUCKETS + [None])]
+
+
+def _bucket_q(low, high):
+    return Q(price__gte=low) & (Q(price__lt=high) if high is not None else Q())
+
+
+def _month_q(first, last):
+    return Q(available_from__lte=last, available_to__gte=first)
+
+
+def compute(queryset, conditions, today):
+    """
+    Facet counts over *queryset*. *conditions* maps each facet ("type",
+    "price", "month") to the Q of its selected filter.
+    """
+    def others(facet):
+        q = Q()
+        for name, condition in conditions.items():
+            if name != facet:
+                q &= condition
+        return q
+
+    buckets, months = _price_buckets(), _months(today)
+    aggregates = {'total': Count('id', filter=others(None))}
+    for value, _ in Offer.TYPES:
+        aggregates[f'type_{value}'] = Count('id', filter=Q(type=value) & others('type'))
+    for i, (low, high) in enumerate(buckets):
+        aggregates[f'price_{i}'] = Count('id', filter=_bucket_q(low, high) & others('price'))
+    for i, (first, last) in enumerate(months):
+        aggregates[f'month_{i}'] = Count('id', filter=_month_q(first, last) & others('month'))
+
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {
+        'total': counts['total'],
+        'type': [
+            {'value': value, 'label': label, 'count': counts[f'type_{value}']}
+            for value, label in Offer.TYPES
+        ],
+        'price': [
+            {'min': str(low), 'max': str(high) if high is not None else None,
+             'count': counts[f'price_{i}']}
+            for i, (low, high) in enumerate(buckets)
+        ],
+        'month': [
+            {'month': first.strftime('%Y-%m'), 'count': counts[f'month_{i}']}
+            for i, (first, _) in enumerate(months)
+        ],
+    }
+
+
+def cached(signature, queryset, conditions, today):
+    """
+    ``compute`` through the page cache. *signature* is any JSON-able value
+    that identifies the filters behind *queryset* and *conditions*.
+    """
+    digest = hashlib.sha1(
+        json.dumps(signature, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    key = f'facets:offers:{catalog_version()}:{today}:{digest}'
+    return pages.get_or_compute(key, lambda: compute(queryset, conditions, today))
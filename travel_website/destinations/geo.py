@@ -0,0 +1,112 @@
+# destinations/geo.py
+"""
+Proximity search for spots without PostGIS.
+
+Every spot with coordinates carries ``geo_cell``, the id of the
+CELL_DEGREES × CELL_DEGREES grid cell it falls in (row-major, so the
+cells of one grid row are consecutive integers). A search:
+
+1. turns the query circle's bounding box into one ``geo_cell`` range per
+   grid row (an index range scan each) plus the exact lat/lon box;
+2. computes haversine distances for the candidates with NumPy and keeps
+   those inside the radius, nearest first.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+CELL_DEGREES = 0.1          # ≈ 11 km of latitude
+CELLS_PER_ROW = round(360 / CELL_DEGREES)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def cell_for(latitude, longitude):
+    """
+    Grid cell id of a point, or None without coordinates.
+    """
+    if latitude is None or longitude is None:
+        return None
+    return _row(float(latitude)) * CELLS_PER_ROW + _col(float(longitude))
+
+
+def _row(latitude):
+    return min(math.floor((latitude + 90) / CELL_DEGREES), round(180 / CELL_DEGREES) - 1)
+
+
+def _col(longitude):
+    return math.floor((longitude + 180) / CELL_DEGREES) % CELLS_PER_ROW
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    ``(min_lat, max_lat, min_lon, max_lon)`` around a circle; longitudes
+    may fall outside ±180 when the box crosses the antimeridian.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if max_lat >= 90 or min_lat <= -90 or cos_lat <= 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return min_lat, max_lat, longitude - dlon, longitude + dlon
+
+
+def _lon_spans(min_lon, max_lon):
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def box_filter(latitude, longitude, radius_km):
+    """
+    Q selecting spots inside the circle's bounding box via the cell index.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    rows = range(_row(min_lat), _row(max_lat) + 1)
+    condition = Q()
+    for lo, hi in _lon_spans(min_lon, max_lon):
+        c0, c1 = _col(lo), _col(min(hi, 180 - 1e-9))
+        cells = Q()
+        for row in rows:
+            cells |= Q(geo_cell__range=(row * CELLS_PER_ROW + c0, row * CELLS_PER_ROW + c1))
+        condition |= cells & Q(longitude__gte=lo, longitude__lte=hi)
+    return condition & Q(latitude__gte=min_lat, latitude__lte=max_lat)
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Vectorized great-circle distances from one point to arrays of points.
+    """
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit):
+    """
+    ``[(spot_id, distance_km), ...]`` within *radius_km*, nearest first.
+    """
+    candidates = list(
+        queryset.filter(box_filter(latitude, longitude, radius_km))
+                .values_list('id', 'latitude', 'longitude')
+    )
+    if not candidates:
+        return []
+    ids = np.fromiter((c[0] for c in candidates), dtype=np.int64, count=len(candidates))
+    lats = np.fromiter((c[1] for c in candidates), dtype=np.float64, count=len(candidates))
+    lons = np.fromiter((c[2] for c in candidates), dtype=np.float64, count=len(candidates))
+    distances = haversine_km(latitude, longitude, lats, lons)
+
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    inside = inside[np.argsort(distances[inside], kind='stable')]
+    return [(int(ids[i]), float(distances[i])) for i in inside]
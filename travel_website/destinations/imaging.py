@@ -0,0 +1,232 @@
+# destinations/imaging.py
+"""
+Responsive image derivatives for SpotImage / OfferImage.
+
+Each upload is resized to several widths and encoded as WebP and JPEG.
+The results are recorded in the row's ``derivatives`` field as
+``{"source": <image name>, "webp": {"320": <name>, ...}, "jpeg": {...},
+"placeholder": <data URI>}``, and templates build ``srcset`` from that
+field. The placeholder is copied to the row's ``placeholder`` column.
+
+The resizing runs, depending on IMAGE_PIPELINE, in:
+
+* "local"  – a process pool in the web process (the default)
+* "celery" – the ``generate_thumbnails`` task
+* "sync"   – inline (tests, management commands)
+
+``render_derivatives`` only touches files, so it is safe to run in a
+pool worker that has no Django setup.
+"""
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 1280)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+PLACEHOLDER_SIZE = 16
+ORIENTATION_TAG = 0x0112
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def read_image_metadata(file) -> dict:
+    """
+    Dimensions (after EXIF rotation), format and byte size of an upload,
+    from the header alone. Raises ValidationError for a file Pillow cannot
+    identify. The placeholder is made later, with the derivatives.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format = (image.format or "").lower()
+            width, height = image.size
+            # Orientations 5-8 are rotated a quarter turn by exif_transpose
+            # (as the derivatives are). The tag is in the header.
+            if image.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+                width, height = height, width
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError(f"{os.path.basename(file.name or 'Upload')} is not a valid image file.")
+    finally:
+        file.seek(0)
+    return {
+        "width": width,
+        "height": height,
+        "image_format": image_format,
+        "byte_size": file.size,
+    }
+
+
+def placeholder_for(image) -> str:
+    """
+    Tiny base64 JPEG (LQIP) of an already opened, transposed image.
+    """
+    thumb = image.convert("RGB")
+    thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buf = io.BytesIO()
+    thumb.save(buf, "JPEG", quality=40)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def derivative_name(source_name: str, width: int, fmt: str) -> str:
+    """
+    e.g. spots/1/abc.png → derived/spots/1/abc.png-640w.webp
+    """
+    return f"derived/{source_name}-{width}w.{fmt}"
+
+
+def render_derivatives(media_root: str, source_name: str, widths) -> dict:
+    """
+    Write every width/format of *source_name* under *media_root*.
+    Existing derivative files are reused, never re-encoded.
+    """
+    result = {"source": source_name}
+    with Image.open(os.path.join(media_root, source_name)) as original:
+        image = ImageOps.exif_transpose(original)
+        src_w, src_h = image.size
+        result["placeholder"] = placeholder_for(image)
+        # Never upscale; a source narrower than every width gets one variant.
+        targets = sorted({w for w in widths if w < src_w} or {src_w})
+
+        for fmt, (pil_format, options) in FORMATS.items():
+            variants = {}
+            for width in targets:
+                name = derivative_name(source_name, width, fmt)
+                path = os.path.join(media_root, name)
+                if not os.path.exists(path):
+                    height = max(1, round(src_h * width / src_w))
+                    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                    if pil_format == "JPEG" and resized.mode != "RGB":
+                        resized = resized.convert("RGB")
+                    elif resized.mode not in ("RGB", "RGBA"):
+                        resized = resized.convert("RGBA")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.tmp"
+                    resized.save(tmp, pil_format, **options)
+                    os.replace(tmp, path)
+                variants[str(width)] = name
+            result[fmt] = variants
+    return result
+
+
+def _widths():
+    return tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", DEFAULT_WIDTHS))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_PIPELINE_WORKERS", 2),
+                # spawn: never fork a web worker that has live threads.
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def store_derivatives(model, pk, derivatives):
+    """
+    Record derivatives without re-triggering save signals, then refresh
+    the owning destination's cached fragments.
+    """
+    from .cache import invalidate_destination
+
+    model.objects.filter(pk=pk).update(
+        derivatives=derivatives, placeholder=derivatives.get("placeholder", ""),
+    )
+    instance = model.objects.filter(pk=pk).first()
+    if instance is not None:
+        invalidate_destination(instance.owning_destination_id())
+
+
+def build_derivatives(model, pk):
+    """
+    Synchronously build and store derivatives for one image row.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return None
+    derivatives = render_derivatives(str(settings.MEDIA_ROOT), instance.image.name, _widths())
+    store_derivatives(model, pk, derivatives)
+    return derivatives
+
+
+def schedule_derivatives(instance):
+    """
+    Queue derivative generation for *instance* once the transaction commits.
+    """
+    schedule_derivatives_many([instance])
+
+
+def schedule_derivatives_many(instances):
+    """
+    Like schedule_derivatives, with one lookup for the whole batch.
+    """
+    pending = [
+        i for i in instances
+        if i.image and i.derivatives.get("source") != i.image.name
+    ]
+    if not pending:
+        return
+    # Identical bytes are stored once, so another row may already have them.
+    from .storage import shared_derivatives
+
+    shared = shared_derivatives(i.image.name for i in pending)
+    for instance in pending:
+        found = shared.get(instance.image.name)
+        if found:
+            placeholder = found.get("placeholder", "")
+            type(instance).objects.filter(pk=instance.pk).update(
+                derivatives=found, placeholder=placeholder,
+            )
+            instance.derivatives, instance.placeholder = found, placeholder
+        else:
+            _submit(type(instance), instance.pk, instance.image.name)
+
+
+def _submit(model, pk, source_name):
+    mode = getattr(settings, "IMAGE_PIPELINE", "local")
+
+    def submit():
+        if mode == "sync":
+            build_derivatives(model, pk)
+        elif mode == "celery":
+            from .tasks import generate_thumbnails
+
+            generate_thumbnails.delay(pk, model._meta.label)
+        else:
+            future = _get_pool().submit(
+                render_derivatives, str(settings.MEDIA_ROOT), source_name, _widths()
+            )
+            future.add_done_callback(lambda f: _on_rendered(model, pk, f))
+
+    transaction.on_commit(submit)
+
+
+def _on_rendered(model, pk, future):
+    try:
+        derivatives = future.result()
+    except Exception:
+        logger.exception("Derivative generation failed for %s %s", model.__name__, pk)
+        return
+    # Runs on the pool's callback thread, which has its own DB connection.
+    try:
+        store_derivatives(model, pk, derivatives)
+    finally:
+        close_old_connections()
@@ -0,0 +1,187 @@
+# destinations/importer.py
+"""
+Bulk spot import from CSV or NDJSON.
+
+Rows are streamed from the file and handled in chunks. For each chunk,
+rows are validated in Python (the same rules as ``Spot.clean``), slugs
+are assigned, and the chunk is written with one ``bulk_create`` inside
+its own transaction. Spot.save() and full_clean() are never called, and
+slugs are allocated by models.SlugAllocator against the destination's
+slugs, fetched once up front.
+
+With ``upsert``, a row whose (destination, name) already exists updates
+that spot in place and keeps its slug. Without it, such rows are
+reported as errors.
+"""
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import geo
+from . import search
+from .cache import invalidate_destination
+from .models import SlugAllocator, Spot
+
+DEFAULT_CHUNK_SIZE = 1000
+UPSERT_FIELDS = ['overview', 'address', 'latitude', 'longitude', 'geo_cell',
+                 'featured', 'modified_at', 'modified_by']
+
+_COORD_PLACES = Decimal('0.000001')
+_TRUE = {'1', 'true', 'yes', 'y'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, fmt=None):
+    """
+    Yield ``(line_number, row)`` from a CSV (with header) or NDJSON file.
+    A line that cannot be parsed yields a RowError instead of a dict.
+    """
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, newline='', encoding='utf8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for n, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = RowError(f"invalid JSON: {exc}")
+            if not isinstance(row, (dict, RowError)):
+                row = RowError("expected a JSON object")
+            yield n, row
+
+
+def _text(row, *keys):
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def _coord(value, limit, label):
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(str(value).strip()).quantize(_COORD_PLACES)
+    except InvalidOperation:
+        raise RowError(f"{label} is not a number: {value!r}")
+    if not -limit <= number <= limit:
+        raise RowError(f"{label} out of range: {value}")
+    return number
+
+
+def clean_row(row):
+    """
+    Validate one input row; return Spot field values or raise RowError.
+    """
+    if isinstance(row, RowError):
+        raise row
+    name = _text(row, 'name')
+    if not name:
+        raise RowError("Name required")
+    overview, address = _text(row, 'overview'), _text(row, 'address')
+    # bulk_create skips full_clean(), and PostgreSQL rejects the whole
+    # chunk on an over-long value.
+    for field, value in (('name', name), ('overview', overview), ('address', address)):
+        max_length = Spot._meta.get_field(field).max_length
+        if max_length is not None and len(value) > max_length:
+            raise RowError(f"{field.capitalize()} too long (max {max_length})")
+    latitude = _coord(row.get('lat', row.get('latitude')), 90, 'latitude')
+    longitude = _coord(row.get('lon', row.get('longitude')), 180, 'longitude')
+    if (latitude is None) != (longitude is None):
+        raise RowError("Must supply both latitude and longitude")
+    return {
+        'name':      name,
+        'overview':  overview,
+        'address':   address,
+        'latitude':  latitude,
+        'longitude': longitude,
+        'featured':  _text(row, 'featured').lower() in _TRUE,
+        'geo_cell':  geo.cell_for(latitude, longitude),
+    }
+
+
+def import_spots(rows, destination, user=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 upsert=False, dry_run=False, on_error=None, on_progress=None):
+    """
+    Import ``(line_number, row)`` pairs into *destination*.
+
+    *on_error(line, row, message)* is called for every rejected row and
+    *on_progress(report)* after every chunk. Returns the final report.
+    """
+    existing = dict(
+        Spot.objects.filter(destination=destination).values_list('name', 'slug')
+    )
+    prefix = f"{destination.slug}-"
+    slugs = SlugAllocator(Spot, prefix, destination=destination)
+    report = {"read": 0, "created": 0, "updated": 0, "errors": 0}
+    started = time.monotonic()
+
+    def flush(chunk):
+        if not chunk:
+            return
+        spots = list(chunk.values())
+        if not dry_run:
+            with transaction.atomic():
+                Spot.objects.bulk_create(
+                    spots,
+                    batch_size=chunk_size,
+                    update_conflicts=upsert,
+                    unique_fields=['destination', 'name'] if upsert else None,
+                    update_fields=UPSERT_FIELDS if upsert else None,
+                )
+                search.index_many(spots)
+        for spot in spots:
+            if spot.name in existing:
+                report["updated"] += 1
+            else:
+                report["created"] += 1
+                existing[spot.name] = spot.slug
+        elapsed = time.monotonic() - started
+        report["seconds"] = round(elapsed, 3)
+        report["rows_per_sec"] = round(report["read"] / elapsed, 1) if elapsed else float(report["read"])
+        if on_progress:
+            on_progress(report)
+
+    chunk = {}
+    for line, row in rows:
+        report["read"] += 1
+        try:
+            values = clean_row(row)
+            name = values['name']
+            if name in existing and not upsert:
+                raise RowError("Spot already exists (use upsert)")
+        except RowError as exc:
+            report["errors"] += 1
+            if on_error:
+                on_error(line, row, str(exc))
+            continue
+
+        # A name repeated within one chunk: the last row wins.
+        previous = chunk.pop(name, None)
+        slug = (existing.get(name) or (previous.slug if previous else None)
+                or slugs.allocate(prefix + slugify(name)))
+        chunk[name] = Spot(destination=destination, slug=slug,
+                           created_by=user, modified_by=user, **values)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = {}
+    flush(chunk)
+
+    if not dry_run and (report["created"] or report["updated"]):
+        invalidate_destination(destination.pk)
+    report.setdefault("seconds", round(time.monotonic() - started, 3))
+    report.setdefault("rows_per_sec", 0.0)
+    return report
@@ -0,0 +1,27 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from destinations.imaging import build_derivatives
+from destinations.models import SpotImage, OfferImage
+
+class Command(BaseCommand):
+    """Backfill metadata and derivatives for images uploaded before the pipeline."""
+    help = "Fill missing image metadata and WebP/JPEG derivatives for spot and offer images"
+
+    def handle(self, *args, **opts):
+        for model in (SpotImage, OfferImage):
+            done = 0
+            for image in model.objects.exclude(image='').iterator():
+                try:
+                    if image.width is None:
+                        image.fill_image_metadata()
+                        model.objects.filter(pk=image.pk).update(
+                            width=image.width, height=image.height,
+                            image_format=image.image_format, byte_size=image.byte_size,
+                        )
+                    if image.derivatives.get('source') != image.image.name or not image.placeholder:
+                        build_derivatives(model, image.pk)
+                except (OSError, ValueError, ValidationError) as exc:
+                    self.stderr.write(f"{model.__name__} {image.pk}: {exc}")
+                    continue
+                done += 1
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {done} images checked"))
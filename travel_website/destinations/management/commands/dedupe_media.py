@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from destinations.models import SpotImage, OfferImage
+from destinations.storage import media_storage
+
+class Command(BaseCommand):
+    """Move images uploaded before content-addressed storage onto hashed names."""
+    help = "Re-store legacy spot/offer images by content hash; old files are left for gc_media"
+
+    def handle(self, *args, **opts):
+        storage = media_storage()
+        for model in (SpotImage, OfferImage):
+            moved = 0
+            for image in model.objects.exclude(image='').iterator():
+                old = image.image.name
+                try:
+                    with storage.open(old) as fh:
+                        new = storage.save(old, fh)
+                except OSError as exc:
+                    self.stderr.write(f"{model.__name__} {image.pk}: {exc}")
+                    continue
+                if new != old:
+                    # Derivatives are rebuilt (or shared) for the new name.
+                    model.objects.filter(pk=image.pk).update(image=new, derivatives={})
+                    moved += 1
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {moved} images moved"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from destinations.media_gc import (
+    collect_orphans,
+    DEFAULT_GRACE_HOURS,
+    DEFAULT_WORKERS,
+)
+
+
+class Command(BaseCommand):
+    """Delete spot/offer image files that no database row references."""
+    help = "Remove orphaned files (and derivatives) under media/spots and media/offers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report what would be deleted",
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=DEFAULT_GRACE_HOURS,
+            help="Never delete files modified within this many hours",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=DEFAULT_WORKERS,
+            help="Directory scanner threads",
+        )
+
+    def handle(self, *args, **opts):
+        r = collect_orphans(
+            dry_run=opts['dry_run'],
+            grace_hours=opts['grace_hours'],
+            workers=opts['workers'],
+        )
+        verb = "would delete" if opts['dry_run'] else "deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"scanned {r['scanned']} files in {r['seconds']}s ({r['files_per_sec']} files/s); "
+            f"{verb} {r['orphans']} orphans, {r['bytes'] / 1_048_576:.1f} MiB reclaimed; "
+            f"{r['kept_recent']} recent files kept, {r['errors']} errors"
+        ))
@@ -1,27 +1,77 @@
-from csv import DictReader
+import csv
+
+from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
-from destinations.services import create_spot
+from destinations.importer import import_spots, read_rows, DEFAULT_CHUNK_SIZE
 from destinations.models import Destination
-from django.contrib.auth import get_user_model
 
 class Command(BaseCommand):
-    """Bulk import spots from CSV."""
-    help = "Import spots file.csv destination_slug"
+    """Bulk import spots from CSV or NDJSON."""
+    help = "Import spots file.csv|file.ndjson destination_slug"
 
     def add_arguments(self, parser):
         parser.add_argument('csv_path')
         parser.add_argument('destination_slug')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help="Input format (default: from the file extension)")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--upsert', action='store_true',
+                            help="Update spots whose name already exists in the destination")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate and report without writing")
+        parser.add_argument('--errors', metavar='PATH',
+                            help="Write rejected rows to this CSV file")
+        parser.add_argument('--user', metavar='USERNAME',
+                            help="Record this user as creator of the imported spots")
 
     def handle(self, *args, **opts):
-        dest = Destination.objects.get(slug=opts['destination_slug'])
-        with open(opts['csv_path'], newline='', encoding='utf8') as f:
-            for row in DictReader(f):
-                data = {
-                    'destination': dest,
-                    'name':   row['name'],
-                    'overview': row['overview'],
-                    'latitude': row['lat'] or None,
-                    'longitude': row['lon'] or None,
-                }
-                create_spot(data, files={}, user=get_user_model().objects.first())
-                self.stdout.write(self.style.SUCCESS(f"Imported {row['name']}"))
+        try:
+            dest = Destination.objects.get(slug=opts['destination_slug'])
+        except Destination.DoesNotExist:
+            raise CommandError(f"No destination {opts['destination_slug']!r}")
+
+        user = None
+        if opts['user']:
+            user = get_user_model().objects.filter(username=opts['user']).first()
+            if user is None:
+                raise CommandError(f"No user {opts['user']!r}")
+
+        error_file = open(opts['errors'], 'w', newline='', encoding='utf8') if opts['errors'] else None
+        error_writer = csv.writer(error_file) if error_file else None
+        if error_writer:
+            error_writer.writerow(['line', 'name', 'error'])
+
+        def on_error(line, row, message):
+            name = row.get('name', '') if isinstance(row, dict) else ''
+            if error_writer:
+                error_writer.writerow([line, name, message])
+            else:
+                self.stderr.write(f"line {line}: {message}")
+
+        def on_progress(r):
+            self.stdout.write(
+                f"{r['read']} rows read, {r['created']} created, {r['updated']} updated, "
+                f"{r['errors']} errors ({r['rows_per_sec']} rows/s)"
+            )
+
+        try:
+            report = import_spots(
+                read_rows(opts['csv_path'], opts['format']), dest,
+                user=user,
+                chunk_size=opts['chunk_size'],
+                upsert=opts['upsert'],
+                dry_run=opts['dry_run'],
+                on_error=on_error,
+                on_progress=on_progress,
+            )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if error_file:
+                error_file.close()
+
+        prefix = "Dry run: " if opts['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['created']} created, {report['updated']} updated, "
+            f"{report['errors']} rejected in {report['seconds']}s ({report['rows_per_sec']} rows/s)"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from destinations import search
+from destinations.cache import bump_catalog_version
+from destinations.models import Destination, Spot, Offer, SearchEntry
+
+class Command(BaseCommand):
+    """Rebuild SearchEntry rows for every destination, spot and offer."""
+    help = "Re-index all destinations, spots and offers for full-text search"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        size = opts['batch_size']
+        for queryset in (Destination.objects.all(),
+                         Spot.objects.select_related('destination'),
+                         Offer.objects.select_related('destination')):
+            batch, done = [], 0
+            for obj in queryset.order_by('pk').iterator(chunk_size=size):
+                batch.append(obj)
+                if len(batch) >= size:
+                    search.index_many(batch)
+                    done += len(batch)
+                    batch = []
+            search.index_many(batch)
+            done += len(batch)
+            self.stdout.write(self.style.SUCCESS(f"{queryset.model.__name__}: {done} indexed"))
+
+        # Drop entries whose rows are gone, then let the fallback index reload.
+        for kind, model in ((SearchEntry.SPOT, Spot), (SearchEntry.OFFER, Offer)):
+            SearchEntry.objects.filter(kind=kind).exclude(
+                object_id__in=model.objects.values('pk')
+            ).delete()
+        bump_catalog_version()
@@ -0,0 +1,116 @@
+# destinations/media_gc.py
+"""
+Garbage collection of orphaned media files.
+
+A pool of threads lists the directories under MEDIA_ROOT/spots,
+MEDIA_ROOT/offers and their ``derived/`` counterparts (one directory per
+task). Each listing is checked against the database in chunks of
+``image__in`` lookups as it arrives, so memory is bounded by the largest
+single directory rather than by the size of the tree.
+
+A file is an orphan when no SpotImage/OfferImage row references it. A
+derivative is an orphan when its source is. Files younger than the grace
+period are always kept: an upload is written before its row commits.
+"""
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .storage import DEFAULT_GRACE_HOURS, referenced
+
+ROOTS = ("spots", "offers", "derived/spots", "derived/offers")
+DEFAULT_WORKERS = 8
+
+_DERIVED = re.compile(r"^derived/(?P<source>.+)-\d+w\.[a-z]+$")
+
+
+def _scan(path):
+    """
+    List one directory: ``(files, subdirs)``; files are (path, size, mtime).
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, st.st_size, st.st_mtime))
+    except FileNotFoundError:
+        pass
+    return files, subdirs
+
+
+def walk_media(media_root, roots=ROOTS, workers=DEFAULT_WORKERS):
+    """
+    Yield each directory's file list under *roots*, scanning in parallel.
+    """
+    pending = deque(os.path.join(media_root, root) for root in roots)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        while pending or running:
+            while pending and len(running) < workers * 2:
+                running.add(pool.submit(_scan, pending.popleft()))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                pending.extend(subdirs)
+                if files:
+                    yield files
+
+
+def _source_name(name):
+    """
+    The image a file belongs to: itself, or the source of a derivative.
+    """
+    if name.startswith("derived/"):
+        match = _DERIVED.match(name)
+        return match.group("source") if match else None
+    return name
+
+
+def collect_orphans(dry_run=False, grace_hours=DEFAULT_GRACE_HOURS,
+                    workers=DEFAULT_WORKERS, media_root=None):
+    """
+    Delete (or, with *dry_run*, only count) orphaned media files.
+    """
+    media_root = str(media_root or settings.MEDIA_ROOT)
+    cutoff = time.time() - grace_hours * 3600
+    started = time.monotonic()
+    report = {"scanned": 0, "orphans": 0, "bytes": 0, "kept_recent": 0, "errors": 0}
+
+    for files in walk_media(media_root, workers=workers):
+        report["scanned"] += len(files)
+        by_name = {
+            os.path.relpath(path, media_root).replace(os.sep, "/"): (path, size, mtime)
+            for path, size, mtime in files
+        }
+        sources = {name: _source_name(name) for name in by_name}
+        live = referenced({s for s in sources.values() if s})
+
+        for name, (path, size, mtime) in by_name.items():
+            if sources[name] in live:
+                continue
+            if mtime > cutoff:
+                report["kept_recent"] += 1
+                continue
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    report["errors"] += 1
+                    continue
+            report["orphans"] += 1
+            report["bytes"] += size
+
+    elapsed = time.monotonic() - started
+    report["seconds"] = round(elapsed, 3)
+    report["files_per_sec"] = round(report["scanned"] / elapsed, 1) if elapsed else float(report["scanned"])
+    return report
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0002_alter_offerimage_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='destination',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['-created_at', '-id'], name='destination_created_idx'),
+        ),
+    ]
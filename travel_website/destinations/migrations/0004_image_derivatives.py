@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0003_destination_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offerimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='spotimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:43
+
+import destinations.models
+import destinations.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0005_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='offerimage',
+            name='image',
+            field=models.ImageField(storage=destinations.storage.media_storage, upload_to='offers/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='spotimage',
+            name='image',
+            field=models.ImageField(storage=destinations.storage.media_storage, upload_to=destinations.models.spot_image_path),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:50
+
+import math
+
+from django.db import migrations, models
+
+# A copy of destinations.geo.cell_for as of this migration, so later changes
+# to the grid do not change what this migration computes.
+CELL_DEGREES = 0.1
+CELLS_PER_ROW = round(360 / CELL_DEGREES)
+
+
+def cell_for(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    row = min(math.floor((float(latitude) + 90) / CELL_DEGREES), round(180 / CELL_DEGREES) - 1)
+    col = math.floor((float(longitude) + 180) / CELL_DEGREES) % CELLS_PER_ROW
+    return row * CELLS_PER_ROW + col
+
+
+def fill_geo_cells(apps, schema_editor):
+    """Compute geo_cell for spots that already have coordinates."""
+    Spot = apps.get_model('destinations', 'Spot')
+    located = Spot.objects.filter(latitude__isnull=False, longitude__isnull=False) \
+                          .only('id', 'latitude', 'longitude')
+    batch = []
+    for spot in located.iterator(chunk_size=1000):
+        spot.geo_cell = cell_for(spot.latitude, spot.longitude)
+        batch.append(spot)
+        if len(batch) >= 1000:
+            Spot.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    if batch:
+        Spot.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0006_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spot',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_geo_cells, migrations.RunPython.noop),
+    ]
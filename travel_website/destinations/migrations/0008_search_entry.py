@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+VECTOR_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['vector'], name='search_entry_vector_idx')
+
+
+def add_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('destinations', 'SearchEntry'), VECTOR_INDEX)
+
+
+def remove_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('destinations', 'SearchEntry'), VECTOR_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0007_spot_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('destination', 'Destination'), ('spot', 'Spot'), ('offer', 'Offer')], max_length=12)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(max_length=255)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='destinations.destination')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        # GIN is PostgreSQL-only; other databases get no index (and never
+        # fill the vector column).
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='searchentry', index=VECTOR_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_vector_index, remove_vector_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0008_search_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['destination', 'type', 'available_from', 'available_to'], name='offer_dest_type_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['price', 'id'], name='offer_price_idx'),
+        ),
+    ]
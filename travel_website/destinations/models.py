@@ -1,21 +1,97 @@
 import os
+import re
 import uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models import Q
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 
+from . import geo
+from .storage import media_storage
+
 USER = get_user_model()
 
-def _slugify_uniquely(model, base):
-    """Generate a unique slug for the model."""
-    slug = base
-    n = 1
-    while model.objects.filter(slug=slug).exists():
-        slug = f"{base}-{n}"
-        n += 1
-    return slug
+SLUG_RETRIES = 3
+SLUG_SUFFIX_ROOM = 6   # "-99999"
+
+
+def _slug_base(model, base):
+    """
+    *base* cut short enough that it still fits the slug column with a
+    -<n> suffix appended.
+    """
+    max_length = model._meta.get_field('slug').max_length
+    return base[:max_length - SLUG_SUFFIX_ROOM].rstrip('-')
+
+
+def _slugify_uniquely(model, base, scope=None):
+    """
+    Return *base*, or *base*-<n> with n past the highest suffix in use
+    among the rows matching *scope* (the slug's uniqueness constraint).
+    One query, however many collisions there are.
+    """
+    # startswith can use the slug's index (Postgres adds a pattern-ops one
+    # for SlugField); the exact shape is checked here rather than by regex.
+    pattern = re.compile(rf'{re.escape(base)}(?:-([0-9]+))?')
+    taken = model.objects.filter(**(scope or {}), slug__startswith=base)
+    suffixes = [
+        int(match.group(1) or 0)
+        for match in map(pattern.fullmatch, taken.values_list('slug', flat=True))
+        if match
+    ]
+    if not suffixes:
+        return base
+    return f"{base}-{max(suffixes) + 1}"
+
+
+def _save_with_unique_slug(instance, base, save, scope=None):
+    """
+    Assign a slug from *base* and call *save()*. If a concurrent save
+    claimed the same slug first, allocate again.
+    """
+    model = type(instance)
+    base = _slug_base(model, base)
+    for attempt in range(SLUG_RETRIES):
+        instance.slug = _slugify_uniquely(model, base, scope)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            taken = (model.objects.filter(**(scope or {}), slug=instance.slug)
+                                  .exclude(pk=instance.pk).exists())
+            if attempt == SLUG_RETRIES - 1 or not taken:
+                raise
+
+
+class SlugAllocator:
+    """
+    Batch mode for bulk imports: unique slugs for many rows from one
+    prefetched set of the slugs under *prefix* among the rows matching
+    *scope*.
+    """
+
+    def __init__(self, model, prefix='', **scope):
+        self.model = model
+        self.taken = set(
+            model.objects.filter(**scope, slug__startswith=prefix)
+                         .values_list('slug', flat=True)
+        )
+        self._next = {}
+
+    def allocate(self, base):
+        base = _slug_base(self.model, base)
+        n = self._next.get(base, 0)
+        slug = f"{base}-{n}" if n else base
+        while slug in self.taken:
+            n += 1
+            slug = f"{base}-{n}"
+        self._next[base] = n + 1
+        self.taken.add(slug)
+        return slug
 
 def spot_image_path(instance, filename):
     """Generate a unique file path for spot images."""
@@ -56,12 +132,18 @@ class Destination(TimeStamped):
     featured = models.BooleanField(default=False)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # keyset pagination of the public list
+            models.Index(fields=['-created_at', '-id'], name='destination_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = _slugify_uniquely(Destination, slugify(self.name))
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        return _save_with_unique_slug(
+            self, slugify(self.name), lambda: super(Destination, self).save(*args, **kwargs)
+        )
 
     def __str__(self):
         return self.name
@@ -88,6 +170,8 @@ class Spot(TimeStamped):
         max_digits=9, decimal_places=6, null=True, blank=True
     )
     featured = models.BooleanField(default=False)
+    # Grid cell of (latitude, longitude), for proximity search (geo.py)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
 
     objects = SpotManager()
 
@@ -108,21 +192,79 @@ class Spot(TimeStamped):
             raise ValidationError("Must supply both latitude and longitude")
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name)
-            self.slug = _slugify_uniquely(Spot, f"{self.destination.slug}-{base}")
-        self.full_clean()
-        super().save(*args, **kwargs)
+        def save():
+            self.full_clean()
+            self.geo_cell = geo.cell_for(self.latitude, self.longitude)
+            super(Spot, self).save(*args, **kwargs)
+
+        if self.slug:
+            return save()
+        base = f"{self.destination.slug}-{slugify(self.name)}"
+        # Spot slugs are unique per destination.
+        return _save_with_unique_slug(self, base, save,
+                                      scope={'destination_id': self.destination_id})
 
     def __str__(self):
         return f"{self.destination.name}: {self.name}"
 
+# Image rows with generated width variants (see destinations/imaging.py)
+class ResponsiveImage(models.Model):
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Read once at upload time so rendering never has to open the file.
+    width        = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height       = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_format = models.CharField(max_length=10, blank=True, editable=False)
+    byte_size    = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Filled in with the derivatives, off the request thread.
+    placeholder  = models.TextField(blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def fill_image_metadata(self):
+        from .imaging import read_image_metadata
+
+        for field, value in read_image_metadata(self.image).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        # A fresh upload is not yet committed to storage.
+        if self.image and not self.image._committed:
+            self.fill_image_metadata()
+        super().save(*args, **kwargs)
+
+    def srcset(self, fmt):
+        storage = self.image.storage
+        variants = self.derivatives.get(fmt) or {}
+        return ", ".join(
+            f"{storage.url(name)} {width}w"
+            for width, name in sorted(variants.items(), key=lambda kv: int(kv[0]))
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    @property
+    def fallback_url(self):
+        """Largest JPEG derivative, or the original upload."""
+        variants = self.derivatives.get('jpeg') or {}
+        if not variants:
+            return self.image.url
+        width = max(variants, key=int)
+        return self.image.storage.url(variants[width])
+
 # SpotImage model to store images for spots
-class SpotImage(TimeStamped):
+class SpotImage(TimeStamped, ResponsiveImage):
     spot    = models.ForeignKey(
         Spot, on_delete=models.CASCADE, related_name='images'
     )
-    image   = models.ImageField(upload_to=spot_image_path)
+    image   = models.ImageField(upload_to=spot_image_path, storage=media_storage)
     caption = models.CharField(max_length=255, blank=True)
     order   = models.PositiveSmallIntegerField(default=0)
 
@@ -133,7 +275,24 @@ class SpotImage(TimeStamped):
         if not self.pk and self.spot.images.count() >= 10:
             raise ValidationError("Max 10 images per Spot.")
 
+    def owning_destination_id(self):
+        return (Spot.objects.filter(pk=self.spot_id)
+                            .values_list('destination_id', flat=True).first())
+
 # Offer model to store offers for destinations
+class OfferQuerySet(models.QuerySet):
+    def active(self, on=None):
+        """Offers not yet expired on *on* (default: today)."""
+        return self.filter(available_to__gte=on or timezone.localdate())
+
+    def available_between(self, start, end):
+        """Offers covering the whole [start, end] stay."""
+        return self.filter(available_from__lte=start, available_to__gte=end)
+
+class ActiveOfferManager(models.Manager.from_queryset(OfferQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().active()
+
 class Offer(TimeStamped):
     HOTEL = 'hotel'
     PLAN = 'plan'
@@ -156,8 +315,20 @@ class Offer(TimeStamped):
     available_to     = models.DateField()
     contact_whatsapp = models.CharField(max_length=50)
 
+    # The default manager stays unfiltered (admin, cascades, reports);
+    # public pages use Offer.active or .active() on the relation.
+    objects = OfferQuerySet.as_manager()
+    active  = ActiveOfferManager()
+
     class Meta:
         ordering = ['available_from']
+        indexes = [
+            # "hotels in X available between these dates"
+            models.Index(fields=['destination', 'type', 'available_from', 'available_to'],
+                         name='offer_dest_type_dates_idx'),
+            # keyset pagination of offer search by price
+            models.Index(fields=['price', 'id'], name='offer_price_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=Q(available_from__lte=models.F('available_to')),
@@ -173,10 +344,48 @@ class Offer(TimeStamped):
         return f'{self.get_type_display()} @ {self.destination.name}'
 
 # OfferImage model to store images for offers
-class OfferImage(models.Model):
+class OfferImage(ResponsiveImage):
     offer = models.ForeignKey(Offer, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='offers/%Y/%m/%d/')  # Check this line carefully
+    image = models.ImageField(upload_to='offers/%Y/%m/%d/', storage=media_storage)
     order = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         ordering = ['order']
+
+    def owning_destination_id(self):
+        return (Offer.objects.filter(pk=self.offer_id)
+                             .values_list('destination_id', flat=True).first())
+
+# Search index entry for a Destination, Spot or Offer (see destinations/search.py)
+class SearchEntry(models.Model):
+    DESTINATION = 'destination'
+    SPOT = 'spot'
+    OFFER = 'offer'
+    KINDS = [
+        (DESTINATION, "Destination"),
+        (SPOT,        "Spot"),
+        (OFFER,       "Offer"),
+    ]
+
+    kind        = models.CharField(max_length=12, choices=KINDS)
+    object_id   = models.PositiveIntegerField()
+    destination = models.ForeignKey(
+        Destination, on_delete=models.CASCADE, related_name='+'
+    )
+    title  = models.CharField(max_length=255)
+    body   = models.TextField(blank=True)
+    url    = models.CharField(max_length=255)
+    # Filled on PostgreSQL only; other databases use the in-process index.
+    vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry')
+        ]
+        indexes = [
+            # Created on PostgreSQL only (migration 0008).
+            GinIndex(fields=['vector'], name='search_entry_vector_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}: {self.title}'
@@ -0,0 +1,97 @@
+# destinations/pagination.py
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page continues strictly after the ordering values
+of the previous page's last row, e.g. ``(created_at, id) < (c, i)``. With
+an index on the ordering columns every page costs the same, however deep.
+Cursors are opaque url-safe strings; one that does not decode raises
+InvalidCursor rather than quietly restarting at the first page.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds; a cursor must
+    # keep the exact value or rows sharing that millisecond are skipped.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(model, ordering, cursor):
+    """
+    Turn a cursor back into typed ordering values (None for no cursor).
+    Raises InvalidCursor if it does not decode.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise InvalidCursor(cursor)
+        values = [
+            model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+        raise InvalidCursor(cursor)
+    if None in values:
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _after(ordering, values):
+    """
+    Q matching rows that sort strictly after *values* under *ordering*.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        op = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{op}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Return ``(rows, next_cursor)`` for the page after *cursor*.
+
+    *ordering* must end in a unique column (normally ``id``/``-id``).
+    ``next_cursor`` is None on the last page.
+    """
+    ordering = list(ordering)
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(queryset.model, ordering, cursor)
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last, field.lstrip("-")) for field in ordering
+        )
+    return rows, next_cursor
@@ -0,0 +1,254 @@
+# destinations/search.py
+"""
+Full-text search over destinations, spots and offers.
+
+Each searchable row has one SearchEntry (title, body, url). Signals keep
+the entries current; bulk write paths call ``index_many`` themselves.
+
+* PostgreSQL: ``SearchEntry.vector`` is a weighted tsvector (title A,
+  body B) with a GIN index; queries use websearch syntax and ts_rank.
+* Other databases (SQLite test runs): an in-process inverted index is
+  built from the entries and rebuilt whenever the catalog version moves.
+
+Snippets are highlighted in Python, after HTML-escaping, on both backends.
+Offers past their ``available_to`` date are left out of results on both
+backends; their entries stay indexed.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .cache import catalog_version
+from .models import Destination, Offer, SearchEntry, Spot
+
+CONFIG = getattr(settings, "SEARCH_CONFIG", "english")
+DEFAULT_LIMIT = 20
+SNIPPET_CHARS = 160
+TITLE_WEIGHT = 2.0
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _use_postgres():
+    return connection.vendor == "postgresql"
+
+
+# ─────────────────────────────────────────────────────────────
+#  Indexing
+# ─────────────────────────────────────────────────────────────
+def _entry(obj):
+    """
+    Unsaved SearchEntry for a Destination, Spot or Offer.
+    """
+    if isinstance(obj, Destination):
+        return SearchEntry(
+            kind=SearchEntry.DESTINATION, object_id=obj.pk, destination_id=obj.pk,
+            title=obj.name, body=obj.overview,
+            url=reverse('dest_detail', kwargs={'slug': obj.slug}),
+        )
+    if isinstance(obj, Spot):
+        return SearchEntry(
+            kind=SearchEntry.SPOT, object_id=obj.pk, destination_id=obj.destination_id,
+            title=obj.name, body=f"{obj.overview}\n{obj.address}".strip(),
+            url=reverse('spot_detail', kwargs={'dest_slug': obj.destination.slug,
+                                               'spot_slug': obj.slug}),
+        )
+    return SearchEntry(
+        kind=SearchEntry.OFFER, object_id=obj.pk, destination_id=obj.destination_id,
+        title=f"{obj.get_type_display()} – {obj.destination.name}", body=obj.description,
+        url=reverse('dest_detail', kwargs={'slug': obj.destination.slug}),
+    )
+
+
+def _vector():
+    return (SearchVector('title', weight='A', config=CONFIG)
+            + SearchVector('body', weight='B', config=CONFIG))
+
+
+def index_many(objs):
+    """
+    Create or refresh the entries of saved Destinations, Spots or Offers.
+    """
+    entries = [_entry(obj) for obj in objs if obj.pk is not None]
+    if not entries:
+        return
+    SearchEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['destination', 'title', 'body', 'url'],
+    )
+    if _use_postgres():
+        by_kind = defaultdict(list)
+        for entry in entries:
+            by_kind[entry.kind].append(entry.object_id)
+        for kind, ids in by_kind.items():
+            SearchEntry.objects.filter(kind=kind, object_id__in=ids).update(vector=_vector())
+
+
+def index(obj):
+    index_many([obj])
+
+
+def remove(obj):
+    kind = {Destination: SearchEntry.DESTINATION, Spot: SearchEntry.SPOT,
+            Offer: SearchEntry.OFFER}[type(obj)]
+    SearchEntry.objects.filter(kind=kind, object_id=obj.pk).delete()
+
+
+# ─────────────────────────────────────────────────────────────
+#  In-process fallback index
+# ─────────────────────────────────────────────────────────────
+def _normalize(word):
+    """
+    Lowercase plus crude plural folding, so "beaches" finds "beach".
+    """
+    word = word.lower()
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    return [_normalize(w) for w in _WORD.findall(text or "")]
+
+
+class InvertedIndex:
+    """
+    term → {entry id: weighted term frequency}, plus the rows for display.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.postings = {}
+        self.entries = {}
+        self.expires = {}   # entry id → last day an offer entry is shown
+        self.lock = threading.Lock()
+
+    def _rebuild(self, version):
+        postings = defaultdict(dict)
+        entries = {}
+        rows = SearchEntry.objects.values('id', 'kind', 'object_id', 'title', 'body', 'url')
+        for row in rows.iterator(chunk_size=2000):
+            entries[row['id']] = row
+            counts = Counter(terms(row['body']))
+            for term, n in Counter(terms(row['title'])).items():
+                counts[term] += n * TITLE_WEIGHT
+            for term, n in counts.items():
+                postings[term][row['id']] = n
+        available_to = dict(Offer.objects.values_list('id', 'available_to'))
+        expires = {
+            entry_id: available_to[row['object_id']]
+            for entry_id, row in entries.items()
+            if row['kind'] == SearchEntry.OFFER and row['object_id'] in available_to
+        }
+        self.postings, self.entries, self.expires = dict(postings), entries, expires
+        self.version = version
+
+    def search(self, query_terms, limit, today):
+        version = catalog_version()
+        with self.lock:
+            if self.version != version:
+                self._rebuild(version)
+            postings, entries, expires = self.postings, self.entries, self.expires
+
+        lists = [postings.get(t, {}) for t in dict.fromkeys(query_terms)]
+        if not lists or not all(lists):
+            return []
+        matches = {
+            entry_id for entry_id in set.intersection(*(set(p) for p in lists))
+            if expires.get(entry_id, today) >= today
+        }
+        total = len(entries)
+        scores = {
+            entry_id: sum(p[entry_id] * math.log(1 + total / len(p)) for p in lists)
+            for entry_id in matches
+        }
+        best = sorted(scores, key=lambda i: (-scores[i], i))[:limit]
+        return [dict(entries[i], rank=scores[i]) for i in best]
+
+
+_fallback = InvertedIndex()
+
+
+# ─────────────────────────────────────────────────────────────
+#  Querying
+# ─────────────────────────────────────────────────────────────
+def highlight(text, query_terms, length=None):
+    """
+    *text* HTML-escaped, with matching words wrapped in <mark>. With
+    *length*, only an excerpt around the first match is returned.
+    """
+    text = text or ""
+    wanted = set(query_terms)
+    words = list(_WORD.finditer(text))
+    start, end = 0, len(text)
+    if length is not None:
+        first = next((m.start() for m in words if _normalize(m.group()) in wanted), 0)
+        start = max(0, first - length // 4)
+        end = min(len(text), start + length)
+
+    out, pos = [], start
+    for m in words:
+        if m.start() < start or m.end() > end:
+            continue
+        if _normalize(m.group()) in wanted:
+            out.append(escape(text[pos:m.start()]))
+            out.append(f"<mark>{escape(m.group())}</mark>")
+            pos = m.end()
+    out.append(escape(text[pos:end]))
+    return mark_safe(("…" if start else "") + "".join(out) + ("…" if end < len(text) else ""))
+
+
+def _not_expired(today):
+    """
+    Q for entries that are not offers past their ``available_to``.
+    """
+    return ~Q(kind=SearchEntry.OFFER) | Exists(
+        Offer.objects.active(today).filter(pk=OuterRef('object_id'))
+    )
+
+
+def search(query, limit=DEFAULT_LIMIT):
+    """
+    Ranked hits for *query*: dicts with kind, object_id, title, url, rank
+    and highlighted ``title_html`` / ``snippet``.
+    """
+    query = (query or "").strip()
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+
+    today = timezone.localdate()
+    if _use_postgres():
+        q = SearchQuery(query, search_type='websearch', config=CONFIG)
+        hits = list(
+            SearchEntry.objects
+                .filter(_not_expired(today), vector=q)
+                .annotate(rank=SearchRank(F('vector'), q))
+                .order_by('-rank', 'id')
+                .values('id', 'kind', 'object_id', 'title', 'body', 'url', 'rank')[:limit]
+        )
+    else:
+        hits = _fallback.search(query_terms, limit, today)
+
+    for hit in hits:
+        hit['title_html'] = highlight(hit['title'], query_terms)
+        hit['snippet'] = highlight(hit.pop('body'), query_terms, SNIPPET_CHARS)
+    return hits
@@ -1,26 +1,69 @@
 # destinations/serializers.py
 from rest_framework import serializers
-from .models import Destination, Spot, SpotImage, Offer
+from .models import Destination, Spot, SpotImage, Offer, OfferImage
 
-class OfferSerializer(serializers.ModelSerializer):
-    class Meta:
-        model  = Offer
-        fields = '__all__'
 
-class SpotImageSerializer(serializers.ModelSerializer):
+def parse_expand(value):
+    """
+    "spots.images,offers" → {'spots': {'images': {}}, 'offers': {}}
+    """
+    tree = {}
+    for path in filter(None, (p.strip() for p in (value or '').split(','))):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class ShapedSerializer(serializers.ModelSerializer):
+    """
+    Response shape control. ``fields`` keeps only the named top-level
+    fields; ``expand`` (a tree from parse_expand) adds the nested
+    relations listed in ``Meta.expandable``, which are left out otherwise.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = expand or {}
+        for name, serializer_class in getattr(self.Meta, 'expandable', {}).items():
+            if name in expand:
+                self.fields[name] = serializer_class(
+                    many=True, read_only=True, expand=expand[name]
+                )
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SpotImageSerializer(ShapedSerializer):
     class Meta:
         model  = SpotImage
-        fields = ['id', 'image', 'caption', 'order']
+        fields = ['id', 'image', 'caption', 'order',
+                  'width', 'height', 'image_format', 'byte_size', 'placeholder']
+
+class OfferImageSerializer(ShapedSerializer):
+    class Meta:
+        model  = OfferImage
+        fields = ['id', 'image', 'order',
+                  'width', 'height', 'image_format', 'byte_size', 'placeholder']
+
+class OfferSerializer(ShapedSerializer):
+    class Meta:
+        model  = Offer
+        fields = ['id', 'destination', 'type', 'description', 'price',
+                  'available_from', 'available_to', 'contact_whatsapp']
+        expandable = {'images': OfferImageSerializer}
 
-class SpotSerializer(serializers.ModelSerializer):
-    images  = SpotImageSerializer(many=True, read_only=True)
-    offers  = OfferSerializer(many=True, read_only=True)
+class SpotSerializer(ShapedSerializer):
     class Meta:
         model  = Spot
-        fields = '__all__'
+        fields = ['id', 'destination', 'name', 'slug', 'overview', 'address',
+                  'latitude', 'longitude', 'featured', 'created_at', 'modified_at']
+        expandable = {'images': SpotImageSerializer}
 
-class DestinationSerializer(serializers.ModelSerializer):
-    spots = SpotSerializer(many=True, read_only=True)
+class DestinationSerializer(ShapedSerializer):
     class Meta:
         model  = Destination
-        fields = ['id', 'name', 'slug', 'overview', 'spots']
+        fields = ['id', 'name', 'slug', 'overview', 'featured',
+                  'created_at', 'modified_at']
+        expandable = {'spots': SpotSerializer, 'offers': OfferSerializer}
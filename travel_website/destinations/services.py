@@ -1,18 +1,61 @@
 # destinations/services.py
+"""
+Write paths behind the admin forms.
+
+Each form submit runs in one transaction: image files are written to
+storage first, then offers and images are inserted with ``bulk_create``
+and image ``order`` is numbered in memory. bulk_create sends no signals,
+so derivative generation, search indexing and cache invalidation are
+triggered here explicitly.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from . import search
+from .cache import invalidate_destination
+from .imaging import schedule_derivatives_many
+from .models import Offer, OfferImage, Spot, SpotImage
 
-from django.core.files.uploadedfile import UploadedFile
-from django.contrib.auth import get_user_model
+MAX_IMAGES = 10
 
-from .models import Offer, OfferImage, Spot, SpotImage
 
-# destinations/services.py
-from django.core.files.uploadedfile import UploadedFile
-from django.contrib.auth import get_user_model
-from .models import Offer, OfferImage
+def _build_images(model, parent_field, parent, files, first_order):
+    """
+    Unsaved image rows for *files*, with metadata read and files stored.
+    """
+    rows = []
+    for order, upload in enumerate(files, start=first_order):
+        row = model(**{parent_field: parent}, order=order)
+        row.image = upload
+        row.fill_image_metadata()
+        row.image.save(upload.name, upload, save=False)
+        rows.append(row)
+    return rows
 
-User = get_user_model()
 
-from django.core.exceptions import ValidationError
+def _insert_images(model, rows):
+    model.objects.bulk_create(rows)
+    schedule_derivatives_many(rows)
+
+
+def add_images(parent, files):
+    """
+    Append up to MAX_IMAGES uploads to a Spot or Offer.
+    """
+    if isinstance(parent, Spot):
+        model, parent_field = SpotImage, 'spot'
+    else:
+        model, parent_field = OfferImage, 'offer'
+    files = files[:MAX_IMAGES]
+    if not files:
+        return []
+    with transaction.atomic():
+        last = parent.images.aggregate(last=Max('order'))['last']
+        rows = _build_images(model, parent_field, parent, files,
+                             0 if last is None else last + 1)
+        _insert_images(model, rows)
+        invalidate_destination(parent.destination_id)
+    return rows
 
 
 def save_spot(request, destination, instance=None, clear_old_images=False):
@@ -31,27 +74,33 @@ def save_spot(request, destination, instance=None, clear_old_images=False):
         spot_kwargs['created_by'] = request.user
         spot_kwargs['modified_by'] = request.user
 
-    if instance:
-        # If instance is provided, update the spot
-        for key, value in spot_kwargs.items():
-            setattr(instance, key, value)
-        spot = instance
-        spot.save()
-    else:
-        spot = Spot.objects.create(**spot_kwargs)
-
-    # Optionally replace images if needed
-    if clear_old_images:
-        spot.images.all().delete()
-
-    files = request.FILES.getlist('images')
-    for img in files[:10]:
-        SpotImage.objects.create(spot=spot, image=img, order=spot.images.count())
+    with transaction.atomic():
+        if instance:
+            for key, value in spot_kwargs.items():
+                setattr(instance, key, value)
+            spot = instance
+            spot.save()
+        else:
+            spot = Spot.objects.create(**spot_kwargs)
+
+        if clear_old_images:
+            spot.images.all().delete()
+
+        files = request.FILES.getlist('images')[:MAX_IMAGES]
+        if files:
+            first = 0
+            if not (clear_old_images or instance is None):
+                last = spot.images.aggregate(last=Max('order'))['last']
+                first = 0 if last is None else last + 1
+            _insert_images(SpotImage, _build_images(SpotImage, 'spot', spot, files, first))
 
     return spot
 
 
 def save_offers(request, destination, clear_old=False):
+    """
+    Create the offers (and their images) submitted with a destination form.
+    """
     rows = list(zip(
         request.POST.getlist('offer_type'),
         request.POST.getlist('offer_description'),
@@ -63,10 +112,11 @@ def save_offers(request, destination, clear_old=False):
 
     auth = request.user if request.user.is_authenticated else None
 
+    offers, uploads = [], []
     for idx, (tp, desc, price, av_from, av_to, wa) in enumerate(rows):
         if not tp:
             continue
-        offer = Offer.objects.create(
+        offers.append(Offer(
             destination      = destination,
             type             = tp,
             description      = desc,
@@ -76,18 +126,19 @@ def save_offers(request, destination, clear_old=False):
             contact_whatsapp = wa,
             created_by       = auth,
             modified_by      = auth,
-        )
-
-        # Check if files are being passed correctly
-        print(f"Uploading images for offer {offer.id}")
-        files = request.FILES.getlist(f'offer_images_{idx}')
-        print(f"Number of files uploaded: {len(files)}")
-
-        # If files exist, save them
-        for img in files[:10]:
-            print(f"Saving image for offer {offer.id}: {img.name}")
-            OfferImage.objects.create(
-                offer = offer,
-                image = img,
-                order = offer.images.count()
-            )
+        ))
+        uploads.append(request.FILES.getlist(f'offer_images_{idx}')[:MAX_IMAGES])
+
+    if not offers:
+        return []
+
+    with transaction.atomic():
+        Offer.objects.bulk_create(offers)
+        search.index_many(offers)
+        images = []
+        for offer, files in zip(offers, uploads):
+            images += _build_images(OfferImage, 'offer', offer, files, 0)
+        _insert_images(OfferImage, images)
+        invalidate_destination(destination.pk)
+
+    return offers
@@ -1,14 +1,64 @@
 # destinations/signals.py
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save, post_delete
+from django.db.models import QuerySet
 from django.dispatch import receiver
-from .models import SpotImage
-from .tasks import generate_thumbnails, clear_destination_cache
+from .models import Destination, Spot, SpotImage, Offer, OfferImage
+from .cache import invalidate_destination
+from .imaging import schedule_derivatives
+from .storage import release_on_commit
+from . import search
 
-@receiver(pre_save, sender=SpotImage)
-def post_image_upload(sender, instance, **kwargs):
-    # After image saved we’ll kick off thumbnail task in model's save method
-    if instance.pk is None:
-        # new image
-        pass
+# ─── Image derivatives ────────────────────────────────────
+@receiver(post_save, sender=SpotImage)
+@receiver(post_save, sender=OfferImage)
+def image_saved(sender, instance, **kwargs):
+    schedule_derivatives(instance)
 
-# Cache invalidation task would be scheduled in services after spot update.
+@receiver(post_delete, sender=SpotImage)
+@receiver(post_delete, sender=OfferImage)
+def image_deleted(sender, instance, **kwargs):
+    # Files are shared by content; drop them once nothing points at them.
+    release_on_commit(instance.image.name, instance.derivatives)
+
+
+# ─── Cache invalidation ───────────────────────────────────
+@receiver([post_save, post_delete], sender=Destination)
+def destination_changed(sender, instance, **kwargs):
+    invalidate_destination(instance.pk)
+
+@receiver([post_save, post_delete], sender=Spot)
+@receiver([post_save, post_delete], sender=Offer)
+def child_changed(sender, instance, **kwargs):
+    invalidate_destination(instance.destination_id)
+
+@receiver([post_save, post_delete], sender=SpotImage)
+@receiver([post_save, post_delete], sender=OfferImage)
+def image_changed(sender, instance, origin=None, **kwargs):
+    # In a cascade from a spot, offer or destination, the parent's own
+    # post_delete covers the destination; skip the lookup per image.
+    if not _cascaded(sender, origin):
+        invalidate_destination(instance.owning_destination_id())
+
+def _cascaded(sender, origin):
+    """True for a delete of *sender* rows started on another model."""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender
+
+
+# ─── Search index ─────────────────────────────────────────
+@receiver(post_save, sender=Destination)
+@receiver(post_save, sender=Spot)
+@receiver(post_save, sender=Offer)
+def searchable_saved(sender, instance, created=False, **kwargs):
+    search.index(instance)
+    if sender is Destination and not created:
+        # Offer titles carry the destination name.
+        search.index_many(instance.offers.select_related('destination'))
+
+@receiver(post_delete, sender=Spot)
+@receiver(post_delete, sender=Offer)
+def searchable_deleted(sender, instance, **kwargs):
+    # Destination entries go with the destination row (FK cascade).
+    search.remove(instance)
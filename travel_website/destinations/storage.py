@@ -0,0 +1,197 @@
+# destinations/storage.py
+"""
+Content-addressed storage for SpotImage / OfferImage uploads.
+
+An upload is stored under the sha256 of its bytes, e.g.
+``offers/3f/a2/3fa2…e1.png``, so identical files share one copy on disk
+(and, because derivative names derive from the source name, one set of
+derivatives). The hash is computed over the upload's chunks; nothing is
+read into memory whole.
+
+A file is referenced by every image row whose ``image`` holds its name.
+``release_many`` deletes files and their derivatives once the last of
+those rows is gone, unless they were (re-)uploaded within the grace
+period. Image deletes queue their files with ``release_on_commit``, so a
+transaction checks all of its files in one query per image model.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+IMAGE_MODELS = ("destinations.SpotImage", "destinations.OfferImage")
+# Files written or re-uploaded this recently are never deleted (release_many,
+# gc_media): an upload lands on disk before its row commits.
+DEFAULT_GRACE_HOURS = 24
+
+LOOKUP_CHUNK = 500
+
+_stats_lock = threading.Lock()
+_stats = {"stored": 0, "deduplicated": 0, "bytes_saved": 0, "released": 0}
+_pending = threading.local()
+
+
+def _bump(counter, n=1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files by content hash and skips writing
+    bytes it already has. The first path segment proposed by ``upload_to``
+    (``spots``/``offers``) is kept.
+
+    ``save`` only swaps the proposed name for the hashed one; validation,
+    ``get_available_name`` and ``_save`` run as in any Storage.
+    """
+
+    def hashed_name(self, name, digest):
+        prefix = name.replace("\\", "/").split("/", 1)[0]
+        ext = os.path.splitext(name)[1].lower()
+        return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return super().save(self.hashed_name(name, digest.hexdigest()), content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The name is the content hash: a file already stored under it
+        # holds the same bytes, so it is reused rather than suffixed.
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage can not find an available filename for "{name}".'
+            )
+        return name
+
+    def _save(self, name, content):
+        try:
+            # Refresh the mtime: the file may be an old orphan, and gc_media
+            # and release_many() must treat it as a fresh upload whose row
+            # has not committed yet.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass
+        else:
+            _bump("deduplicated")
+            _bump("bytes_saved", content.size)
+            return name
+        # Written under a unique name and renamed into place, so a reader
+        # never sees a partial file; a concurrent upload of the same bytes
+        # just replaces it with an identical copy.
+        partial = super()._save(f"{name}.{uuid.uuid4().hex}.part", content)
+        os.replace(self.path(partial), self.path(name))
+        _bump("stored")
+        return name
+
+
+def media_storage():
+    """
+    Storage callable for image fields (keeps migrations free of instances).
+    """
+    return _storage
+
+
+_storage = ContentAddressedStorage()
+
+
+def referenced(names) -> set:
+    """
+    The subset of *names* held by some image row, across all image models.
+    """
+    names = list(names)
+    found = set()
+    for start in range(0, len(names), LOOKUP_CHUNK):
+        chunk = names[start:start + LOOKUP_CHUNK]
+        for label in IMAGE_MODELS:
+            found.update(
+                apps.get_model(label).objects
+                .filter(image__in=chunk).values_list("image", flat=True)
+            )
+    return found
+
+
+def shared_derivatives(names) -> dict:
+    """
+    Derivatives already built by some row for each of *names*, by name.
+    """
+    names = set(names)
+    found = {}
+    for label in IMAGE_MODELS:
+        if not names - found.keys():
+            break
+        rows = (apps.get_model(label).objects
+                .filter(image__in=names - found.keys())
+                .exclude(derivatives={})
+                .values_list("image", "derivatives"))
+        for name, derivatives in rows:
+            if derivatives.get("source") == name:
+                found.setdefault(name, derivatives)
+    return found
+
+
+def release_many(files):
+    """
+    Delete each file in *files* (name → derivatives) that no image row
+    references any more, with its derivatives. One lookup per image model
+    covers the whole batch.
+    """
+    files = {name: derivatives for name, derivatives in files.items() if name}
+    storage = media_storage()
+    released = 0
+    for name in files.keys() - referenced(files):
+        try:
+            age = time.time() - os.path.getmtime(storage.path(name))
+        except FileNotFoundError:
+            age = None
+        if age is not None and age < DEFAULT_GRACE_HOURS * 3600:
+            # Re-uploaded recently; its new row may not have committed yet.
+            # gc_media collects it later if it really is an orphan.
+            continue
+        for fmt in ("webp", "jpeg"):
+            for derived in ((files[name] or {}).get(fmt) or {}).values():
+                storage.delete(derived)
+        storage.delete(name)
+        released += 1
+    _bump("released", released)
+    return released
+
+
+def _flush_pending():
+    files = getattr(_pending, "files", {})
+    _pending.files = {}
+    if files:
+        release_many(files)
+
+
+def release_on_commit(name, derivatives=None):
+    """
+    Release *name* once the current transaction commits. Deletes in one
+    transaction (e.g. a cascade from a destination) are released together.
+    """
+    if not hasattr(_pending, "files"):
+        _pending.files = {}
+    _pending.files[name] = derivatives
+    # Registered on every call, as in cache.invalidate_destination: a
+    # rolled-back block drops its callback.
+    transaction.on_commit(_flush_pending)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
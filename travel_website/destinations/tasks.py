@@ -1,15 +1,14 @@
 # destinations/tasks.py
 from celery import shared_task
-from django.core.cache import cache
-from .models import SpotImage
+from django.apps import apps
+from .imaging import build_derivatives
+from .cache import bump_destination_version
 
 @shared_task
-def generate_thumbnails(image_id):
-    """Pretend to resize images asynchronously."""
-    img = SpotImage.objects.get(pk=image_id)
-    # … image processing here …
+def generate_thumbnails(image_id, model_label='destinations.SpotImage'):
+    """Build the responsive WebP/JPEG derivatives of one image row."""
+    return build_derivatives(apps.get_model(model_label), image_id)
 
 @shared_task
 def clear_destination_cache(destination_id):
-    cache_key = f'dest-{destination_id}'
-    cache.delete(cache_key)
+    bump_destination_version(destination_id)
@@ -1,3 +1,417 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from PIL import Image
+
+from django.db import transaction
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.helpers import create_session
+from users.models import User
+
+from . import geo, search
+from .cache import destination_version
+from .imaging import read_image_metadata
+from .importer import import_spots, read_rows
+from .media_gc import collect_orphans
+from .models import Destination, Offer, SlugAllocator, Spot, SpotImage
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .storage import media_storage
+
+
+class InvalidationTests(TransactionTestCase):
+    def test_commit_after_rollback_still_invalidates(self):
+        destination = Destination.objects.create(name='Cox Bazar')
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                destination.overview = 'rolled back'
+                destination.save()
+                raise RuntimeError
+
+        before = destination_version(destination.pk)
+        with transaction.atomic():
+            destination.overview = 'committed'
+            destination.save()
+        self.assertNotEqual(destination_version(destination.pk), before)
+
+
+class ImportSlugTests(TransactionTestCase):
+    def test_long_names_get_slugs_that_fit_the_column(self):
+        destination = Destination.objects.create(name='Cox Bazar')
+        name = 'Himchari National Park Waterfall Viewpoint'
+        rows = [(1, {'name': name}), (2, {'name': name + ' North'}), (3, {'name': 'x' * 256})]
+        errors = []
+        report = import_spots(rows, destination,
+                              on_error=lambda line, row, message: errors.append(line))
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(errors, [3])
+        max_length = Spot._meta.get_field('slug').max_length
+        slugs = list(Spot.objects.values_list('slug', flat=True))
+        self.assertEqual(len(set(slugs)), 2)
+        self.assertTrue(all(len(slug) <= max_length for slug in slugs))
+
+
+class ImportUpsertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = Destination.objects.create(name='Cox Bazar')
+        self.inani = Spot.objects.create(destination=self.destination, name='Inani Beach',
+                                         overview='old')
+        self.rows = [
+            (2, {'name': 'Inani Beach', 'overview': 'new', 'lat': '21.2167', 'lon': '92.05'}),
+            (3, {'name': 'Himchari', 'featured': 'yes'}),
+        ]
+
+    def _import(self, **kwargs):
+        errors = []
+        report = import_spots(self.rows, self.destination, chunk_size=1,
+                              on_error=lambda line, row, message: errors.append((line, message)),
+                              **kwargs)
+        return report, errors
+
+    def test_upsert_updates_in_place_and_keeps_the_slug(self):
+        report, errors = self._import(upsert=True)
+        self.assertEqual((report['created'], report['updated'], errors), (1, 1, []))
+        inani = Spot.objects.get(pk=self.inani.pk)
+        self.assertEqual((inani.slug, inani.overview), (self.inani.slug, 'new'))
+        self.assertEqual(inani.geo_cell, geo.cell_for(inani.latitude, inani.longitude))
+        self.assertTrue(Spot.objects.get(name='Himchari').featured)
+
+    def test_existing_names_are_errors_without_upsert(self):
+        report, errors = self._import()
+        self.assertEqual((report['created'], report['updated']), (1, 0))
+        self.assertEqual(errors, [(2, 'Spot already exists (use upsert)')])
+        self.assertEqual(Spot.objects.get(pk=self.inani.pk).overview, 'old')
+
+    def test_dry_run_reports_without_writing(self):
+        report, errors = self._import(upsert=True, dry_run=True)
+        self.assertEqual((report['read'], report['created'], report['updated']), (2, 1, 1))
+        self.assertEqual(list(Spot.objects.values_list('name', 'overview')),
+                         [('Inani Beach', 'old')])
+
+    def test_ndjson_rows_report_bad_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), 'spots.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w', encoding='utf8') as f:
+            f.write('{"name": "Laboni"}\n\n[1]\n{"name": \n')
+        self.rows = list(read_rows(path))
+        report, errors = self._import()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([line for line, _ in errors], [3, 4])
+
+
+class SlugTests(TestCase):
+    def test_save_takes_the_next_free_suffix(self):
+        slugs = [Destination.objects.create(name='Cox Bazar').slug for _ in range(3)]
+        self.assertEqual(slugs, ['cox-bazar', 'cox-bazar-1', 'cox-bazar-2'])
+        Destination.objects.create(name='Cox Bazar North')
+        Destination.objects.create(name='x', slug='cox-bazar-9')
+        self.assertEqual(Destination.objects.create(name='Cox Bazar').slug, 'cox-bazar-10')
+
+    def test_spot_slugs_are_unique_per_destination(self):
+        first, second = (Destination.objects.create(name=name) for name in ('Sylhet', 'Bandarban'))
+        Spot.objects.create(destination=second, name='Other', slug='sylhet-ratargul')
+        self.assertEqual(Spot.objects.create(destination=first, name='Ratargul').slug,
+                         'sylhet-ratargul')
+
+    def test_allocator_skips_taken_slugs_in_scope_only(self):
+        first, second = (Destination.objects.create(name=name) for name in ('Sylhet', 'Bandarban'))
+        Spot.objects.create(destination=first, name='Ratargul')
+        Spot.objects.create(destination=first, name='Other', slug='sylhet-ratargul-1')
+        Spot.objects.create(destination=second, name='Lake', slug='sylhet-lake')
+
+        slugs = SlugAllocator(Spot, 'sylhet-', destination=first)
+        self.assertEqual([slugs.allocate('sylhet-ratargul') for _ in range(2)],
+                         ['sylhet-ratargul-2', 'sylhet-ratargul-3'])
+        self.assertEqual(slugs.allocate('sylhet-lake'), 'sylhet-lake')
+
+
+class NearbyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        destination = Destination.objects.create(name='Cox Bazar')
+        points = {'Laboni': ('21.4272', '91.9799'), 'Himchari': ('21.3551', '92.0230'),
+                  'Inani': ('21.2167', '92.0500'), 'Sylhet': ('24.8949', '91.8687'),
+                  'East': ('0.01', '179.99'), 'West': ('0.01', '-179.99'), 'Unmapped': (None, None)}
+        cls.spots = {name: Spot.objects.create(destination=destination, name=name,
+                                               latitude=lat, longitude=lon)
+                     for name, (lat, lon) in points.items()}
+
+    def setUp(self):
+        cache.clear()
+
+    def _names(self, hits):
+        by_id = {spot.pk: name for name, spot in self.spots.items()}
+        return [by_id[spot_id] for spot_id, _ in hits]
+
+    def test_nearest_first_within_radius(self):
+        hits = geo.nearby(Spot.objects.all(), 21.4272, 91.9799, 30, 10)
+        self.assertEqual(self._names(hits), ['Laboni', 'Himchari', 'Inani'])
+        self.assertAlmostEqual(hits[1][1], 9.175, places=2)
+        self.assertEqual(self._names(geo.nearby(Spot.objects.all(), 21.4272, 91.9799, 30, 2)),
+                         ['Laboni', 'Himchari'])
+
+    def test_box_crosses_the_antimeridian(self):
+        hits = geo.nearby(Spot.objects.all(), 0.01, 179.995, 5, 10)
+        self.assertEqual(sorted(self._names(hits)), ['East', 'West'])
+
+    def test_api(self):
+        body = self.client.get('/api/spots/nearby/?lat=21.4272&lon=91.9799&radius=10').json()
+        self.assertEqual([row['name'] for row in body['results']], ['Laboni', 'Himchari'])
+        self.assertEqual(body['results'][0]['distance_km'], 0)
+        self.assertEqual(self.client.get('/api/spots/nearby/?lat=91&lon=0').status_code, 400)
+
+
+class FallbackSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = Destination.objects.create(
+            name='Cox Bazar', overview='Long sandy beaches & <b>fresh</b> fish.')
+        Spot.objects.create(destination=self.destination, name='Inani Beach')
+
+    def _offer(self, description, available_to):
+        return Offer.objects.create(
+            destination=self.destination, type=Offer.BOAT, description=description,
+            price=20, available_from=datetime.date(2020, 1, 1), available_to=available_to,
+            contact_whatsapp='+8801000000000')
+
+    def test_ranks_titles_first_and_highlights_escaped_text(self):
+        hits = search.search('beach')
+        self.assertEqual([hit['title'] for hit in hits], ['Inani Beach', 'Cox Bazar'])
+        self.assertEqual(hits[0]['title_html'], 'Inani <mark>Beach</mark>')
+        self.assertIn('<mark>beaches</mark> &amp; &lt;b&gt;fresh', hits[1]['snippet'])
+        self.assertEqual(search.search('beach lagoon'), [])
+
+    def test_new_rows_are_found_without_a_restart(self):
+        self.assertEqual(search.search('ratargul'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Spot.objects.create(destination=self.destination, name='Ratargul Swamp')
+        self.assertEqual([hit['title'] for hit in search.search('ratargul')], ['Ratargul Swamp'])
+
+    def test_expired_offers_are_not_returned(self):
+        today = timezone.localdate()
+        current = self._offer('Sunset cruise', today)
+        self._offer('Sunset cruise, last season', today - datetime.timedelta(days=1))
+        hits = search.search('cruise')
+        self.assertEqual([hit['object_id'] for hit in hits], [current.pk])
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cox, sylhet = (Destination.objects.create(name=name) for name in ('Cox Bazar', 'Sylhet'))
+        month = datetime.timedelta(days=31)
+        rows = [
+            (cox, Offer.HOTEL, 80, today, today + month),
+            (cox, Offer.HOTEL, 99, today + 2 * month, today + 3 * month),
+            (cox, Offer.BOAT, 300, today, today + month),
+            (cox, Offer.HOTEL, 60, today - 2 * month, today - month),    # expired
+            (sylhet, Offer.TRAIN, 1500, today, today + month),
+        ]
+        Offer.objects.bulk_create([
+            Offer(destination=destination, type=kind, price=price, available_from=start,
+                  available_to=end, contact_whatsapp='+8801000000000')
+            for destination, kind, price, start, end in rows
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def _counts(self, facet, body):
+        key = {'type': 'value', 'price': 'min', 'month': 'month'}[facet]
+        return {row[key]: row['count'] for row in body[facet] if row['count']}
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        body = self.client.get('/api/offers/facets/?destination=cox-bazar&type=hotel').json()
+        self.assertEqual(body['total'], 2)
+        self.assertEqual(self._counts('type', body), {'hotel': 2, 'boat': 1})
+        self.assertEqual(self._counts('price', body), {'50': 2})
+        self.assertEqual(body['month'][0]['count'], 1)     # this month
+
+        body = self.client.get('/api/offers/facets/?max_price=100').json()
+        self.assertEqual(self._counts('type', body), {'hotel': 2})
+        self.assertEqual(self._counts('price', body), {'50': 2, '250': 1, '1000': 1})
+
+    def test_expired_offers_counted_only_on_request(self):
+        self.assertEqual(self.client.get('/api/offers/facets/').json()['total'], 4)
+        self.assertEqual(
+            self.client.get('/api/offers/facets/?include_expired=1').json()['total'], 5)
+
+    def test_counts_match_the_listing(self):
+        query = 'destination=cox-bazar&type=hotel&min_price=90'
+        facets = self.client.get(f'/api/offers/facets/?{query}').json()
+        listing = self.client.get(f'/api/offers/?{query}').json()
+        self.assertEqual(facets['total'], len(listing['results']))
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        destinations = [Destination.objects.create(name=f'Place {i}') for i in range(3)]
+        # Names repeat across destinations: the id tiebreak keeps pages disjoint.
+        Spot.objects.bulk_create([
+            Spot(destination=destinations[i % 3], name=f'Spot {i // 3}', slug=f'spot-{i}')
+            for i in range(11)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_cover_every_row_once(self):
+        ordering = ('name', 'id')
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Spot.objects.all(), ordering, cursor, page_size=3)
+            seen += [spot.pk for spot in rows]
+            if cursor is None:
+                break
+        expected = list(Spot.objects.order_by(*ordering).values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ('zzz', encode_cursor(['a']), encode_cursor(['x', 'not-an-id'])):
+            with self.assertRaises(InvalidCursor):
+                keyset_page(Spot.objects.all(), ('name', 'id'), cursor)
+
+    def test_api_follows_next_links(self):
+        url, names = '/api/spots/?page_size=4&fields=id,name', []
+        while url:
+            body = self.client.get(url).json()
+            names += [row['name'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(len(names), 11)
+
+    def test_api_rejects_bad_cursor_and_unknown_fields(self):
+        self.assertEqual(self.client.get('/api/destinations/?cursor=zzz').status_code, 400)
+        self.assertEqual(self.client.get('/destinations/?cursor=zzz').status_code, 400)
+        self.assertEqual(self.client.get('/api/spots/?fields=id,nope').status_code, 400)
+        self.assertEqual(self.client.get('/api/spots/?expand=nope').status_code, 400)
+        row = self.client.get('/api/spots/?fields=id,images&expand=images').json()['results'][0]
+        self.assertEqual(set(row), {'id', 'images'})
+
+
+def png_upload(name='photo.png', size=(64, 48), color=(200, 120, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class AdminTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PIPELINE='sync')
+        media.enable()
+        self.addCleanup(media.disable)
+        admin = User.objects.create(username='admin', email='admin@example.com',
+                                    password_hash='x', is_admin=True)
+        self.client.cookies['session_token'] = create_session(admin)
+        self.destination = Destination.objects.create(name='Cox Bazar')
+
+
+class ImageUploadTests(AdminTestMixin, TransactionTestCase):
+    def _add_spot(self, upload):
+        return self.client.post(f'/destinations/admin/{self.destination.slug}/spots/add/',
+                                {'name': 'Inani Beach', 'images': [upload]})
+
+    def test_unreadable_upload_is_a_form_error(self):
+        bogus = SimpleUploadedFile('notes.png', b'not an image', content_type='image/png')
+        with self.assertRaises(ValidationError):
+            read_image_metadata(bogus)
+        response = self._add_spot(bogus)
+        self.assertContains(response, 'notes.png is not a valid image file.', status_code=400)
+        self.assertFalse(Spot.objects.exists())
+
+    def test_placeholder_is_built_with_the_derivatives(self):
+        self.assertEqual(self._add_spot(png_upload()).status_code, 302)
+        image = Spot.objects.get().images.get()
+        self.assertEqual((image.width, image.height), (64, 48))
+        self.assertTrue(image.placeholder.startswith('data:image/jpeg;base64,'))
+        self.assertTrue(image.derivatives['webp'])
+
+
+class MediaStorageTests(AdminTestMixin, TransactionTestCase):
+    def _spot_with_image(self, name, upload):
+        spot = Spot.objects.create(destination=self.destination, name=name)
+        image = SpotImage(spot=spot)
+        image.image.save(upload.name, upload)
+        return image
+
+    def _age(self, name):
+        old = os.path.getmtime(media_storage().path(name)) - 48 * 3600
+        os.utime(media_storage().path(name), (old, old))
+
+    def test_identical_uploads_share_one_file_until_the_last_row_goes(self):
+        first = self._spot_with_image('Inani Beach', png_upload('a.png'))
+        second = self._spot_with_image('Laboni Beach', png_upload('b.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^spots/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        path = media_storage().path(first.image.name)
+        self._age(first.image.name)
+
+        first.spot.delete()
+        self.assertTrue(os.path.exists(path))
+        second.spot.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_recent_reupload_is_kept(self):
+        image = self._spot_with_image('Inani Beach', png_upload())
+        image.spot.delete()
+        self.assertTrue(os.path.exists(media_storage().path(image.image.name)))
+
+    def test_cascade_delete_queries_do_not_grow_with_images(self):
+        def delete_with(count):
+            destination = Destination.objects.create(name=f'Place {count}')
+            spot = Spot.objects.create(destination=destination, name='Beach')
+            SpotImage.objects.bulk_create(
+                SpotImage(spot=spot, image=f'spots/{count}/{i}.png', order=i)
+                for i in range(count)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                destination.delete()
+            self.assertFalse(SpotImage.objects.filter(spot=spot).exists())
+            return len(queries)
+
+        self.assertEqual(delete_with(2), delete_with(12))
+
+
+class MediaGcTests(AdminTestMixin, TransactionTestCase):
+    def _write(self, name, age_hours=0):
+        path = media_storage().path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 10)
+        mtime = os.path.getmtime(path) - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_collects_old_orphans_and_their_derivatives_only(self):
+        spot = Spot.objects.create(destination=self.destination, name='Inani Beach')
+        SpotImage.objects.bulk_create([SpotImage(spot=spot, image='spots/aa/bb/live.png')])
+        live = [self._write('spots/aa/bb/live.png', 48),
+                self._write('derived/spots/aa/bb/live.png-320w.webp', 48)]
+        orphans = [self._write('spots/cc/dd/gone.png', 48),
+                   self._write('derived/spots/cc/dd/gone.png-320w.webp', 48)]
+        recent = self._write('offers/ee/ff/new.png')
+
+        report = collect_orphans(dry_run=True, workers=2)
+        self.assertEqual((report['scanned'], report['orphans'], report['kept_recent']), (5, 2, 1))
+        self.assertTrue(all(os.path.exists(path) for path in orphans))
+
+        report = collect_orphans(workers=2)
+        self.assertEqual((report['orphans'], report['bytes']), (2, 20))
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        self.assertTrue(all(os.path.exists(path) for path in live + [recent]))
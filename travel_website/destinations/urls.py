@@ -6,6 +6,7 @@ from .views import (
     public_destination_list,
     public_destination_detail,
     public_spot_detail,
+    public_search,
     # Admin dest
     admin_destination_list,
     admin_destination_add,
@@ -26,6 +27,8 @@ from .views import (
 urlpatterns = [
     # Public list first
     path('', public_destination_list, name='dest_public_list'),
+    # Before the slug routes, which would otherwise match "search"
+    path('search/', public_search, name='dest_search'),
 
     # ---------- Admin routes ----------
     path('admin/', admin_destination_list, name='dest_admin_list'),
@@ -1,8 +1,21 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, ValidationError
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from users.helpers import get_authenticated_user, admin_required
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from users.helpers import admin_required
 from .models import Destination, Spot, Offer, SpotImage, OfferImage
-from .services import save_offers, save_spot
+from .services import add_images, save_offers, save_spot
+from .pagination import InvalidCursor, keyset_page
+from . import search
+from .cache import destination_version, catalog_version, pages, FRAGMENT_TTL
 from django.contrib import messages  # To show success or error messages
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Offer, OfferImage
@@ -10,47 +23,193 @@ from .models import Offer, OfferImage
 
 
 # ──────────────────────── PUBLIC ──────────────────────────
+LIST_PAGE_SIZE = 12
+LIST_SPOT_PREVIEW = 6
+LIST_OFFER_PREVIEW = 4
+PUBLIC_PAGE_MAX_AGE = getattr(settings, 'PUBLIC_PAGE_MAX_AGE', 60)
+SEARCH_MAX_QUERY = 200
+
+
+def _count_subquery(queryset):
+    """Correlated COUNT of *queryset* rows per destination (no join fan-out)."""
+    counts = (queryset.filter(destination=OuterRef('pk'))
+                           .order_by()
+                           .values('destination')
+                           .annotate(n=Count('pk'))
+                           .values('n'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def _max_modified_subquery(model):
+    """Correlated MAX(modified_at) of *model* rows per destination."""
+    latest = (model.objects.filter(destination=OuterRef('pk'))
+                           .order_by()
+                           .values('destination')
+                           .annotate(m=Max('modified_at'))
+                           .values('m'))
+    return Subquery(latest)
+
+
+def _destination_state(request, slug):
+    """
+    ``(etag, last_modified)`` of a destination's pages, or None if there is
+    no such destination. One query, memoized on the request.
+
+    Last-Modified is the newest modified_at of the destination, its spots
+    and its offers. The ETag adds the destination's cache version, which
+    also moves on deletes and image changes.
+    """
+    memo = request.__dict__.setdefault('_destination_state', {})
+    if slug not in memo:
+        row = (Destination.objects.filter(slug=slug)
+                          .annotate(spots_modified=_max_modified_subquery(Spot),
+                                    offers_modified=_max_modified_subquery(Offer))
+                          .values('id', 'modified_at', 'spots_modified', 'offers_modified')
+                          .first())
+        state = None
+        if row:
+            last = max(filter(None, (row['modified_at'], row['spots_modified'],
+                                     row['offers_modified'])))
+            # The date is part of it because offers expire at midnight.
+            etag = (f"d{row['id']}-{destination_version(row['id'])}-"
+                    f"{last.timestamp():.6f}-{timezone.localdate()}")
+            state = (etag, last)
+        memo[slug] = state
+    return memo[slug]
+
+
+def _destination_condition(slug_kwarg):
+    """
+    Conditional GET (ETag / Last-Modified → 304) for a destination page;
+    the view does not run at all when the client's copy is current.
+    """
+    def etag(request, **kwargs):
+        state = _destination_state(request, kwargs[slug_kwarg])
+        return state[0] if state else None
+
+    def last_modified(request, **kwargs):
+        state = _destination_state(request, kwargs[slug_kwarg])
+        return state[1] if state else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def public_page(view):
+    """
+    Public pages carry no per-user data (the header is fetched separately
+    from users.views.user_header_view), so shared caches may store them.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            patch_cache_control(response, public=True, max_age=PUBLIC_PAGE_MAX_AGE)
+        return response
+    return wrapper
+
+
+def _etag_part(value):
+    """
+    Query-string input as a short digest, safe to put in an ETag header.
+    """
+    return hashlib.sha1(value.encode()).hexdigest()[:16]
+
+
+@public_page
+@condition(etag_func=lambda request: (
+    f"list-{catalog_version()}-{timezone.localdate()}-{_etag_part(request.GET.get('cursor', ''))}"))
 def public_destination_list(request):
-    user = get_authenticated_user(request)
-    destinations = Destination.objects.prefetch_related('spots').all()
+    destinations = (
+        Destination.objects
+            .annotate(spot_count=_count_subquery(Spot.objects),
+                      offer_count=_count_subquery(Offer.active))
+            .prefetch_related(
+                Prefetch('spots',
+                         queryset=Spot.objects.only('id', 'name', 'destination_id')[:LIST_SPOT_PREVIEW],
+                         to_attr='spot_preview'),
+                Prefetch('offers',
+                         queryset=Offer.active.all()[:LIST_OFFER_PREVIEW],
+                         to_attr='offer_preview'),
+            )
+    )
+    cursor = request.GET.get('cursor')
+
+    def build_page():
+        return keyset_page(
+            destinations,
+            ordering=('-created_at', '-id'),
+            cursor=cursor,
+            page_size=LIST_PAGE_SIZE,
+        )
+
+    if cursor:
+        try:
+            page, next_cursor = build_page()
+        except InvalidCursor:
+            raise BadRequest("Invalid cursor.")
+    else:
+        # The first page is the hot key: share it across workers.
+        page, next_cursor = pages.get_or_compute(
+            f'dest-list:{catalog_version()}:{timezone.localdate()}', build_page
+        )
     return render(request, 'destinations/list.html', {
-        'destinations': destinations,
-        'user': user,
+        'destinations': page,
+        'next_cursor': next_cursor,
+    })
+
+def _search_query(request):
+    return request.GET.get('q', '').strip()[:SEARCH_MAX_QUERY]
+
+
+@public_page
+@condition(etag_func=lambda request: (
+    f"search-{catalog_version()}-{_etag_part(_search_query(request))}"))
+def public_search(request):
+    """
+    GET /destinations/search/?q=
+    Ranked destinations, spots and offers with highlighted snippets.
+    """
+    query = _search_query(request)
+    return render(request, 'destinations/search.html', {
+        'query': query,
+        'hits': search.search(query) if query else [],
     })
 
+
+@public_page
+@_destination_condition('slug')
 def public_destination_detail(request, slug):
     """
     GET /destinations/<slug>/
     Shows one region plus its Spots and its Offers (with images).
+    The offers and spots sections are cached fragments keyed by the
+    destination's cache version; their querysets stay lazy so a cache
+    hit never runs them.
     """
-    user = get_authenticated_user(request)
-
-    # Prefetch both spots and offer→images in one go:
-    destination = get_object_or_404(
-        Destination.objects
-            .prefetch_related('spots')                # spots list
-            .prefetch_related('offers__images'),      # each offer.images
-        slug=slug
-    )
+    destination = get_object_or_404(Destination, slug=slug)
 
     return render(request, 'destinations/destination_detail.html', {
         'destination': destination,
         'spots': destination.spots.all(),
-        'offers': destination.offers.all(),  # images already prefetched
-        'user': user,
+        'offers': destination.offers.active().prefetch_related('images'),
+        'cache_version': destination_version(destination.id),
+        'today': timezone.localdate(),
+        'fragment_ttl': FRAGMENT_TTL,
     })
 
 
+@public_page
+@_destination_condition('dest_slug')
 def public_spot_detail(request, dest_slug, spot_slug):
-    user = get_authenticated_user(request)
     spot = get_object_or_404(
-        Spot.objects.with_related(),
+        Spot.objects.select_related('destination'),
         destination__slug=dest_slug,
         slug=spot_slug
     )
     return render(request, 'destinations/spot_detail.html', {
         'spot': spot,
-        'user': user,
+        'cache_version': destination_version(spot.destination_id),
+        'fragment_ttl': FRAGMENT_TTL,
     })
 
 
@@ -86,6 +245,7 @@ def admin_destination_add(request):
 
 @admin_required
 def admin_offer_add(request):
+    error = None
     if request.method == 'POST':
         destination_slug = request.POST.get('destination')
         destination = get_object_or_404(Destination, slug=destination_slug)
@@ -97,32 +257,36 @@ def admin_offer_add(request):
         available_to = request.POST.get('offer_to')
         contact_whatsapp = request.POST.get('offer_contact')
 
-        offer = Offer.objects.create(
-            destination=destination,
-            type=offer_type,
-            description=description,
-            price=price,
-            available_from=available_from,
-            available_to=available_to,
-            contact_whatsapp=contact_whatsapp
-        )
-
-        # Saving images
-        offer_images = request.FILES.getlist('offer_images')
-        for img in offer_images[:10]:
-            OfferImage.objects.create(offer=offer, image=img)
-
-        return redirect('dest_admin_list')
+        try:
+            with transaction.atomic():
+                offer = Offer.objects.create(
+                    destination=destination,
+                    type=offer_type,
+                    description=description,
+                    price=price,
+                    available_from=available_from,
+                    available_to=available_to,
+                    contact_whatsapp=contact_whatsapp
+                )
+
+                # Saving images
+                add_images(offer, request.FILES.getlist('offer_images'))
+        except ValidationError as exc:
+            error = ' '.join(exc.messages)
+        else:
+            return redirect('dest_admin_list')
 
     destinations = Destination.objects.all()
     return render(request, 'destinations/admin_offer_form.html', {
         'destinations': destinations,
-        'offer_type_choices': Offer.TYPES
-    })
+        'offer_type_choices': Offer.TYPES,
+        'error': error,
+    }, status=400 if error else 200)
 
 @admin_required
 def admin_offer_edit(request, id):
     offer = get_object_or_404(Offer, id=id)
+    error = None
 
     if request.method == 'POST':
         offer.type = request.POST.get('offer_type')
@@ -131,19 +295,22 @@ def admin_offer_edit(request, id):
         offer.available_from = request.POST.get('offer_from')
         offer.available_to = request.POST.get('offer_to')
         offer.contact_whatsapp = request.POST.get('offer_contact')
-        offer.save()
-
-        # Handle uploaded images
-        offer_images = request.FILES.getlist('offer_images')
-        for img in offer_images[:10]:
-            OfferImage.objects.create(offer=offer, image=img)
+        try:
+            with transaction.atomic():
+                offer.save()
 
-        return redirect('dest_admin_list')
+                # Handle uploaded images
+                add_images(offer, request.FILES.getlist('offer_images'))
+        except ValidationError as exc:
+            error = ' '.join(exc.messages)
+        else:
+            return redirect('dest_admin_list')
 
     return render(request, 'destinations/admin_offer_edit_form.html', {
         'offer': offer,
-        'offer_type_choices': Offer.TYPES
-    })
+        'offer_type_choices': Offer.TYPES,
+        'error': error,
+    }, status=400 if error else 200)
 
 
 from django.shortcuts import render, get_object_or_404, redirect
@@ -172,20 +339,26 @@ def admin_offer_delete(request, id):
 @admin_required
 def admin_destination_edit(request, slug):
     dest = get_object_or_404(Destination, slug=slug)
+    error = None
     if request.method == 'POST':
         dest.name = request.POST.get('name', '').strip()
         dest.overview = request.POST.get('overview', '').strip()
-        dest.save()
-
-        # Save offers (optional)
-        save_offers(request, dest, clear_old=True)
+        try:
+            with transaction.atomic():
+                dest.save()
 
-        return redirect('dest_admin_list')
+                # Save offers (optional)
+                save_offers(request, dest, clear_old=True)
+        except ValidationError as exc:
+            error = ' '.join(exc.messages)
+        else:
+            return redirect('dest_admin_list')
 
     return render(request, 'destinations/admin_region_form.html', {
         'destination': dest,
         'offer_type_choices': Offer.TYPES,  # Pass the Offer.TYPES for dropdown
-    })
+        'error': error,
+    }, status=400 if error else 200)
 
 
 @admin_required
@@ -214,27 +387,40 @@ def admin_spot_list(request, dest_slug):
 @admin_required
 def admin_spot_add(request, dest_slug):
     dest = get_object_or_404(Destination, slug=dest_slug)
+    error = None
     if request.method == 'POST':
-        save_spot(request, destination=dest)
-        return redirect('dest_admin_spot_list', dest_slug=dest.slug)
+        try:
+            save_spot(request, destination=dest)
+        except ValidationError as exc:
+            error = ' '.join(exc.messages)
+        else:
+            return redirect('dest_admin_spot_list', dest_slug=dest.slug)
 
     return render(request, 'destinations/admin_spot_form.html', {
         'destination': dest,
-    })
+        'error': error,
+    }, status=400 if error else 200)
 
 
 @admin_required
 def admin_spot_edit(request, dest_slug, spot_slug):
     dest = get_object_or_404(Destination, slug=dest_slug)
     spot = get_object_or_404(Spot, destination=dest, slug=spot_slug)
+    error = None
     if request.method == 'POST':
-        save_spot(request, destination=dest, instance=spot, clear_old_images=True)
-        return redirect('dest_admin_spot_list', dest_slug=dest.slug)
+        try:
+            save_spot(request, destination=dest, instance=spot, clear_old_images=True)
+        except ValidationError as exc:
+            error = ' '.join(exc.messages)
+            spot.refresh_from_db()
+        else:
+            return redirect('dest_admin_spot_list', dest_slug=dest.slug)
 
     return render(request, 'destinations/admin_spot_form.html', {
         'destination': dest,
         'spot': spot,
-    })
+        'error': error,
+    }, status=400 if error else 200)
 
 @admin_required
 def admin_spot_delete(request, dest_slug, spot_slug):
@@ -0,0 +1,12 @@
+# gunicorn.conf.py – production server: gunicorn -c gunicorn.conf.py
+# Uvicorn workers serve the ASGI application, so the async auth views
+# (users/views.py) release the worker while bcrypt runs in its pool.
+import multiprocessing
+import os
+
+wsgi_app = "travel_site.asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+timeout = 30
+graceful_timeout = 30
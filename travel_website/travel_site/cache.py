@@ -0,0 +1,310 @@
+"""
+Two-tier cache helper.
+
+L1 is a small per-process LRU with a short TTL; L2 is a Django cache
+(``CACHES``), shared by every worker. ``TwoTierCache.get_or_compute``
+adds two protections for hot keys:
+
+* single-flight – only one caller recomputes an expired key. Other threads
+  in the process wait on a lock, and other processes see an L2 lock and
+  are served the stale value (or wait briefly when there is none);
+* probabilistic early refresh ("XFetch") – each read may recompute a little
+  before expiry, with a probability that grows as expiry approaches and with
+  how slow the last computation was, so hot keys rarely expire at all.
+
+The L2 lock is ``cache.add``, which is atomic on Redis and Memcached but
+not on the file-based cache; ``check_atomic_l2`` (system check W001)
+warns when a TwoTierCache runs on such a backend.
+
+L2 entries are envelopes ``(value, expires_at, compute_seconds)`` kept for
+``ttl + stale_ttl`` seconds, so a stale value is available while a refresh
+is in flight.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """
+    Thread-safe LRU with a per-entry deadline.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            deadline, value = item
+            if time.monotonic() > deadline:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class KeyMetrics:
+    """
+    Bounded per-key counters (least recently touched keys are forgotten).
+    """
+
+    FIELDS = ("l1_hits", "l2_hits", "misses", "computes", "early_refreshes",
+              "stale_served", "lock_waits")
+
+    def __init__(self, max_keys=500):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self, key, field):
+        with self._lock:
+            counters = self._data.get(key)
+            if counters is None:
+                counters = self._data[key] = dict.fromkeys(self.FIELDS, 0)
+            counters[field] += 1
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            per_key = {key: dict(c) for key, c in self._data.items()}
+        totals = dict.fromkeys(self.FIELDS, 0)
+        for counters in per_key.values():
+            for field, n in counters.items():
+                totals[field] += n
+        return {"totals": totals, "keys": per_key}
+
+
+class TwoTierCache:
+    """
+    Process-local L1 in front of a shared Django cache (L2).
+
+    Pass ``track_keys=False`` for high-cardinality keys (e.g. sessions);
+    their metrics are then aggregated under a single ``"*"`` entry.
+    """
+
+    def __init__(self, namespace, ttl=300, local_ttl=5, local_max_entries=1024,
+                 stale_ttl=60, lock_ttl=10, beta=1.0, alias="default",
+                 track_keys=True):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_ttl = lock_ttl
+        self.beta = beta
+        self.alias = alias
+        self.track_keys = track_keys
+        self.local = LocalLRU(local_max_entries, local_ttl)
+        self.metrics = KeyMetrics()
+        self._flight_locks = {}   # key -> [lock, callers]; dropped when unused
+        self._flight_guard = threading.Lock()
+        _registry[namespace] = self
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _bump(self, key, field):
+        self.metrics.bump(key if self.track_keys else "*", field)
+
+    # ── plain get / set ───────────────────────────────────────
+    def _envelope(self, key):
+        """
+        Return ``(envelope, tier)``; tier is "l1_hits", "l2_hits" or "misses".
+        """
+        full = self._key(key)
+        envelope = self.local.get(full)
+        if envelope is not None:
+            return envelope, "l1_hits"
+        envelope = self.shared.get(full)
+        if envelope is None:
+            return None, "misses"
+        self.local.set(full, envelope, ttl=max(envelope[1] - time.time(), 0))
+        return envelope, "l2_hits"
+
+    def _lookup(self, key):
+        """
+        Return ``(envelope, fresh)`` and record the hit or miss.
+        """
+        envelope, tier = self._envelope(key)
+        if envelope is not None and time.time() >= envelope[1]:
+            tier = "misses"
+        self._bump(key, tier)
+        return envelope, tier != "misses"
+
+    def get(self, key, default=None):
+        envelope, fresh = self._lookup(key)
+        return envelope[0] if fresh else default
+
+    def set(self, key, value, ttl=None, compute_seconds=0.0):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        full = self._key(key)
+        envelope = (value, time.time() + ttl, compute_seconds)
+        self.shared.set(full, envelope, timeout=int(ttl + self.stale_ttl) + 1)
+        self.local.set(full, envelope, ttl=ttl)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        full = [self._key(k) for k in keys]
+        for k in full:
+            self.local.delete(k)
+        if full:
+            self.shared.delete_many(full)
+
+    # ── single-flight recomputation ───────────────────────────
+    def _flight_lock(self, key):
+        with self._flight_guard:
+            entry = self._flight_locks.get(key)
+            if entry is None:
+                entry = self._flight_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _flight_done(self, key):
+        with self._flight_guard:
+            entry = self._flight_locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._flight_locks[key]
+
+    def _should_refresh_early(self, envelope):
+        _, expires_at, delta = envelope
+        if not delta:
+            return False
+        return time.time() - delta * self.beta * math.log(random.random() or 1e-12) >= expires_at
+
+    def _compute(self, key, compute, ttl):
+        started = time.monotonic()
+        value = compute()
+        self._bump(key, "computes")
+        self.set(key, value, ttl=ttl, compute_seconds=time.monotonic() - started)
+        return value
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        Return the cached value for *key*, calling *compute()* at most once
+        across the fleet when it is missing, expired or due for early refresh.
+        """
+        envelope, fresh = self._lookup(key)
+        if fresh:
+            if not self._should_refresh_early(envelope):
+                return envelope[0]
+            self._bump(key, "early_refreshes")
+        stale = envelope[0] if envelope is not None else _MISSING
+
+        lock = self._flight_lock(key)
+        try:
+            if not lock.acquire(blocking=stale is _MISSING):
+                # Another thread here is already refreshing.
+                self._bump(key, "stale_served")
+                return stale
+            try:
+                # Someone may have finished while we were waiting for the lock.
+                if stale is _MISSING:
+                    envelope, _ = self._envelope(key)
+                    if envelope is not None and time.time() < envelope[1]:
+                        return envelope[0]
+
+                lock_key = self._key(f"{key}:lock")
+                if self.shared.add(lock_key, 1, timeout=self.lock_ttl):
+                    try:
+                        return self._compute(key, compute, ttl)
+                    finally:
+                        self.shared.delete(lock_key)
+
+                # Another process holds the L2 lock.
+                if stale is not _MISSING:
+                    self._bump(key, "stale_served")
+                    return stale
+                self._bump(key, "lock_waits")
+                deadline = time.monotonic() + self.lock_ttl
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    envelope = self.shared.get(self._key(key))
+                    if envelope is not None and time.time() < envelope[1]:
+                        return envelope[0]
+                return self._compute(key, compute, ttl)
+            finally:
+                lock.release()
+        finally:
+            self._flight_done(key)
+
+    def stats(self):
+        data = self.metrics.snapshot()
+        data["l1_size"] = len(self.local)
+        return data
+
+
+_registry = {}
+
+
+def stats():
+    """
+    Metrics of every TwoTierCache in this process, by namespace.
+    """
+    return {name: c.stats() for name, c in _registry.items()}
+
+
+# Backends whose add() is atomic across processes (locmem: per process,
+# which is all it ever shares with).
+ATOMIC_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_atomic_l2(app_configs=None, **kwargs):
+    aliases = {"default"} | {c.alias for c in _registry.values()}
+    return [
+        checks.Warning(
+            f"Cache '{alias}' ({settings.CACHES[alias]['BACKEND']}) has no atomic add(); "
+            "the TwoTierCache single-flight lock will not hold across workers.",
+            hint="Set REDIS_URL (Redis is the production cache backend).",
+            id="travel_site.W001",
+        )
+        for alias in sorted(aliases)
+        if alias in settings.CACHES and settings.CACHES[alias]["BACKEND"] not in ATOMIC_BACKENDS
+    ]
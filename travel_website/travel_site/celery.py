@@ -0,0 +1,17 @@
+"""
+Celery application for travel_site.
+
+Start a worker with ``celery -A travel_site worker`` and the periodic
+scheduler with ``celery -A travel_site beat``. Configuration is read from
+the ``CELERY_*`` settings.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_site.settings')
+
+app = Celery('travel_site')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
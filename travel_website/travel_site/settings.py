@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -71,12 +72,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'travel_site.wsgi.application'
+# Deployed under ASGI (gunicorn.conf.py runs uvicorn workers): the login,
+# registration and reset views are async and await bcrypt in a thread
+# pool, which only frees the worker under an ASGI server.
+ASGI_APPLICATION = 'travel_site.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-import os
 from urllib.parse import urlparse
 
 # Parse the connection string
@@ -99,6 +103,38 @@ DATABASES = {
 
 
 
+# Cache
+# L2 of travel_site/cache.py and the store for sessions and fragments.
+# Production: Redis (REDIS_URL). Its add() is atomic, which the cross-worker
+# single-flight lock relies on; the system check travel_site.W001 warns on
+# any other backend. Without REDIS_URL a small file-based cache is used,
+# for local development only (its add() is not atomic, and every set()
+# past MAX_ENTRIES lists the whole directory to cull).
+# CACHE_BACKEND=locmem for tests.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if os.environ.get('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+elif REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -142,7 +178,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # Email Backend Settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Set EMAIL_BACKEND to django.core.mail.backends.console.EmailBackend or
+# django.core.mail.backends.filebased.EmailBackend for local testing.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -162,3 +201,64 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Path where uploaded media will b
 
 # settings.py
 LOGIN_URL = '/login/'  # Redirect users to login page if not authenticated
+
+
+# Session resolution cache (users/session_cache.py)
+SESSION_CACHE_SHARED_TTL = 300           # seconds in the shared Django cache
+
+# Session tokens: "db" (Session rows) or "signed" (stateless HMAC tokens,
+# revocations kept in the RevokedToken table). Existing tokens of either kind
+# stay valid after switching.
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'db')
+
+
+# Celery (travel_site/celery.py)
+from celery.schedules import crontab
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_BEAT_SCHEDULE = {
+    'sweep-auth-state': {
+        'task': 'users.tasks.sweep_auth_state_task',
+        'schedule': crontab(minute=17),  # hourly
+    },
+}
+
+# Auth state sweeper (users/sweeper.py)
+LOGIN_LOG_RETENTION_DAYS = 90
+
+# Password hashing (users/hashing.py); tune with `manage.py bcrypt_calibrate`
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_MAX_WORKERS = 4   # threads allowed to hash concurrently per process
+
+# Login / mail throttling (users/throttling.py): bucket -> (capacity, period seconds)
+THROTTLE_RATES = {
+    'login_ip': (30, 60),
+    'login_identifier': (10, 15 * 60),
+    'mail_ip': (5, 60 * 60),
+    'mail_address': (3, 60 * 60),
+}
+
+# Outbound mail queue (users/mail.py): "thread", "celery" or "sync"
+MAIL_QUEUE_BACKEND = os.environ.get('MAIL_QUEUE_BACKEND', 'thread')
+MAIL_MAX_RETRIES = 5
+MAIL_QUEUE_SIZE = 1000
+
+# LoginLog write-behind buffer (users/audit.py)
+AUDIT_BUFFER_ENABLED = True
+AUDIT_BUFFER_SIZE = 10000    # events held in memory before new ones are dropped
+AUDIT_FLUSH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 5     # seconds
+
+# Destination page fragments (destinations/cache.py); invalidated by signals
+DESTINATION_FRAGMENT_TTL = 60 * 60
+
+# max-age of the public destination pages (Cache-Control: public)
+PUBLIC_PAGE_MAX_AGE = int(os.environ.get('PUBLIC_PAGE_MAX_AGE', 60))
+
+# Responsive image derivatives (destinations/imaging.py): "local", "celery" or "sync"
+IMAGE_PIPELINE = os.environ.get('IMAGE_PIPELINE', 'local')
+IMAGE_PIPELINE_WORKERS = 2
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+
+# Upper bounds of the offer price facet buckets (destinations/facets.py)
+OFFER_PRICE_BUCKETS = (50, 100, 250, 500, 1000)
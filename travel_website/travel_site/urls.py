@@ -24,11 +24,13 @@ from django.conf.urls.static import static
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
+from destinations.api import router
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('users.urls')),
     path('destinations/', include('destinations.urls')),
+    path('api/', include(router.urls)),
     # Add other URL patterns here
 ]
 
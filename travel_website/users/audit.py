@@ -0,0 +1,128 @@
+# users/audit.py
+"""
+Write-behind buffer for LoginLog rows.
+
+Auth events are queued in memory (per worker process) and written with one
+``bulk_create`` when FLUSH_SIZE events are waiting, every FLUSH_INTERVAL
+seconds, and at interpreter shutdown. The queue is bounded: when it is
+full, new events are dropped and counted rather than slowing down logins.
+"""
+import atexit
+import ipaddress
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import LoginLog
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = getattr(settings, "AUDIT_BUFFER_SIZE", 10000)
+FLUSH_SIZE = getattr(settings, "AUDIT_FLUSH_SIZE", 200)
+FLUSH_INTERVAL = getattr(settings, "AUDIT_FLUSH_INTERVAL", 5)
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_wakeup = threading.Event()
+_flush_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+
+
+def _bump(counter, n=1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+def _clean_ip(ip_address):
+    try:
+        return str(ipaddress.ip_address(ip_address)) if ip_address else None
+    except ValueError:
+        return None
+
+
+def flush() -> int:
+    """
+    Write everything currently queued; returns the number of rows written.
+    """
+    with _flush_lock:
+        written = 0
+        while True:
+            batch = []
+            while len(batch) < FLUSH_SIZE:
+                try:
+                    batch.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return written
+            try:
+                LoginLog.objects.bulk_create(batch)
+            except Exception:
+                _bump("failed", len(batch))
+                logger.exception("Could not write %d login log rows", len(batch))
+            else:
+                written += len(batch)
+                _bump("written", len(batch))
+                _bump("flushes")
+
+
+def _run_flusher():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, name="audit-flush", daemon=True)
+            _flusher.start()
+
+
+atexit.register(flush)
+
+
+def record(user_id: int, event_type: str, ip_address: str = None):
+    """
+    Queue one auth event; never touches the database on the caller's thread.
+    """
+    if not getattr(settings, "AUDIT_BUFFER_ENABLED", True):
+        LoginLog.objects.create(
+            user_id=user_id, event_type=event_type, ip_address=_clean_ip(ip_address)
+        )
+        return
+
+    _ensure_flusher()
+    entry = LoginLog(
+        user_id=user_id,
+        event_type=event_type,
+        ip_address=_clean_ip(ip_address),
+        timestamp=timezone.now(),
+    )
+    try:
+        _queue.put_nowait(entry)
+    except queue.Full:
+        _bump("dropped")
+        return
+    _bump("queued")
+    if _queue.qsize() >= FLUSH_SIZE:
+        _wakeup.set()
+
+
+def stats() -> dict:
+    with _stats_lock:
+        data = dict(_stats)
+    data["pending"] = _queue.qsize()
+    return data
@@ -0,0 +1,53 @@
+# users/hashing.py
+"""
+bcrypt hashing off the request path.
+
+bcrypt releases the GIL while hashing, so a small dedicated thread pool
+gives real parallelism while bounding how many cores a login burst can
+occupy. The async helpers await the pool; the sync ones run inline.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+DEFAULT_ROUNDS = 12
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BCRYPT_MAX_WORKERS", 4),
+    thread_name_prefix="bcrypt",
+)
+
+
+def configured_rounds() -> int:
+    return getattr(settings, "BCRYPT_ROUNDS", DEFAULT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(configured_rounds())).decode()
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    True when the stored hash was made with a different cost factor.
+    """
+    try:
+        cost = int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return cost != configured_rounds()
+
+
+async def ahash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
+
+
+async def acheck_password(password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, check_password, password, password_hash)
@@ -1,14 +1,18 @@
 # users/helpers.py
 
+import hashlib
 import secrets
 from datetime import timedelta
 import re
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import redirect
 from functools import wraps
 
-from .models import User, Session, LoginLog
+from .models import User, Session
+from . import audit, session_cache, session_tokens
 
 SESSION_DURATION_MINUTES = 60
 PERSISTENT_SESSION_DURATION_DAYS = 7
@@ -17,18 +21,25 @@ PERSISTENT_SESSION_DURATION_DAYS = 7
 # ─────────────────────────────────────────────────────────────
 #  Sessions
 # ─────────────────────────────────────────────────────────────
-def create_session(user_id: int, persistent: bool = False) -> str:
+def create_session(user: User, persistent: bool = False) -> str:
     """
-    Create a new Session row and return its token.
+    Start a session for *user* and return its token.
+
+    With SESSION_TOKEN_MODE = "signed" the token is a signed, stateless
+    payload; otherwise a Session row is created. Both kinds are accepted
+    by get_authenticated_user, so the mode can be switched at any time.
     """
-    token = secrets.token_urlsafe(32)
     expires_at = (
         timezone.now() + timedelta(days=PERSISTENT_SESSION_DURATION_DAYS)
         if persistent
         else timezone.now() + timedelta(minutes=SESSION_DURATION_MINUTES)
     )
+    if getattr(settings, "SESSION_TOKEN_MODE", "db") == "signed":
+        return session_tokens.issue(user, expires_at, persistent)
+
+    token = secrets.token_urlsafe(32)
     Session.objects.create(
-        user_id=user_id,
+        user_id=user.id,
         session_token=token,
         expires_at=expires_at,
         is_persistent=persistent,
@@ -39,12 +50,37 @@ def create_session(user_id: int, persistent: bool = False) -> str:
 def get_authenticated_user(request):
     """
     Return a dict of user info if a valid session_token cookie is present,
-    otherwise return None.
+    otherwise return None. The result is memoized on the request, so
+    repeated calls within one request cost a single lookup.
     """
+    if not hasattr(request, "_cached_auth_user"):
+        request._cached_auth_user = _resolve_session(request)
+    return request._cached_auth_user
+
+
+async def aget_authenticated_user(request):
+    return await sync_to_async(get_authenticated_user)(request)
+
+
+def forget_authenticated_user(request):
+    """
+    Drop the per-request memo (after the session has been ended).
+    """
+    request._cached_auth_user = None
+
+
+def _resolve_session(request):
     token = request.COOKIES.get("session_token")
     if not token:
         return None
 
+    if session_tokens.is_signed_token(token):
+        return session_tokens.verify(token)
+
+    cached = session_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         sess = Session.objects.select_related("user").get(session_token=token)
     except Session.DoesNotExist:
@@ -56,13 +92,46 @@ def get_authenticated_user(request):
         return None
 
     user = sess.user
-    return {
+    info = {
         "id":             user.id,
         "username":       user.username,
         "email":          user.email,
         "is_admin":       user.is_admin,
         "is_persistent":  sess.is_persistent,
     }
+    session_cache.put(token, info, sess.expires_at)
+    return info
+
+
+def end_session(token: str):
+    """
+    End one session (DB row or signed token) and drop it from the caches.
+    """
+    if session_tokens.is_signed_token(token):
+        session_tokens.revoke(token)
+        return
+    Session.objects.filter(session_token=token).delete()
+    session_cache.invalidate(token)
+
+
+def end_all_sessions(user: User):
+    """
+    End every session of *user* (e.g. after a password reset), in both modes.
+    """
+    sessions = Session.objects.filter(user_id=user.id)
+    session_cache.invalidate_many(list(sessions.values_list("session_token", flat=True)))
+    sessions.delete()
+    session_tokens.revoke_user(user.id)
+
+
+# ─────────────────────────────────────────────────────────────
+#  Email-link tokens
+# ─────────────────────────────────────────────────────────────
+def hash_token(token: str) -> str:
+    """
+    Fixed-length digest stored (and indexed) in place of an email-link token.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 # ─────────────────────────────────────────────────────────────
@@ -83,13 +152,9 @@ def is_valid_password(password: str):
 # ─────────────────────────────────────────────────────────────
 def log_auth_event(user_id: int, event_type: str, ip_address: str = None):
     """
-    Record a login or logout event.
+    Record a login or logout event (buffered, see users/audit.py).
     """
-    LoginLog.objects.create(
-        user_id=user_id,
-        event_type=event_type,
-        ip_address=ip_address,
-    )
+    audit.record(user_id, event_type, ip_address)
 
 
 # ─────────────────────────────────────────────────────────────
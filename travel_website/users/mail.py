@@ -0,0 +1,244 @@
+# users/mail.py
+"""
+Outbound mail queue.
+
+Views call ``queue_mail`` and return immediately. Depending on
+MAIL_QUEUE_BACKEND the message is handed to:
+
+* "celery" – the ``users.tasks.send_mail_task`` task (retried with backoff)
+* "thread" – an in-process background sender (the default)
+* "sync"   – sent inline; handy in tests that inspect ``mail.outbox``
+
+Both asynchronous paths share ``PooledMailer``, which keeps one open
+connection to EMAIL_BACKEND across messages instead of doing a TLS
+handshake per mail, and closes it after IDLE_CLOSE_SECONDS without use
+(from the sender thread's loop, or from a timer on Celery workers). Point EMAIL_BACKEND at Django's console or file-based
+backend for local testing.
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = getattr(settings, "MAIL_MAX_RETRIES", 5)
+RETRY_BACKOFF_SECONDS = getattr(settings, "MAIL_RETRY_BACKOFF", 2)
+IDLE_CLOSE_SECONDS = getattr(settings, "MAIL_IDLE_CLOSE_SECONDS", 60)
+QUEUE_SIZE = getattr(settings, "MAIL_QUEUE_SIZE", 1000)
+
+_stats_lock = threading.Lock()
+_stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+
+
+def _bump(counter, n=1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+class PooledMailer:
+    """
+    One reusable backend connection; reopened after errors or idling.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def send(self, subject, body, recipient_list, from_email=None):
+        with self._lock:
+            if self._connection is None:
+                self._connection = get_connection(fail_silently=False)
+                self._connection.open()
+            try:
+                EmailMessage(
+                    subject, body, from_email, recipient_list,
+                    connection=self._connection,
+                ).send()
+            except Exception:
+                self._close()
+                raise
+            self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        with self._lock:
+            if self._connection and time.monotonic() - self._last_used >= IDLE_CLOSE_SECONDS:
+                self._close()
+
+    def close_when_idle(self):
+        """
+        Arm a timer that calls ``close_if_idle`` once the connection has
+        been idle for IDLE_CLOSE_SECONDS. For callers with no loop of their
+        own to call it from (Celery workers).
+        """
+        with self._lock:
+            if self._timer is not None or self._connection is None:
+                return
+            delay = max(self._last_used + IDLE_CLOSE_SECONDS - time.monotonic(), 0)
+            self._timer = threading.Timer(delay, self._idle_timer_fired)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _idle_timer_fired(self):
+        with self._lock:
+            self._timer = None
+        self.close_if_idle()
+        # Still open: it was used meanwhile, so wait for the new idle period.
+        self.close_when_idle()
+
+    def _close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+mailer = PooledMailer()
+
+
+# ─────────────────────────────────────────────────────────────
+#  In-process sender
+# ─────────────────────────────────────────────────────────────
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+# Failed sends waiting for their backoff: (not_before, seq, attempt, message)
+_retries = []
+_retries_lock = threading.Lock()
+_retry_seq = itertools.count()
+
+
+def _send_with_retries(message):
+    # Inline delivery ("sync" backend) only; the worker uses _send_once.
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            mailer.send(**message)
+            _bump("sent")
+            return
+        except Exception:
+            if attempt == MAX_RETRIES:
+                _bump("failed")
+                logger.exception("Giving up on mail to %s", message["recipient_list"])
+                return
+            _bump("retried")
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+
+def _send_once(message, attempt):
+    """
+    One delivery attempt from the worker. A failure is scheduled for a
+    later retry rather than slept on, so one bad message never holds up
+    the rest of the queue.
+    """
+    try:
+        mailer.send(**message)
+        _bump("sent")
+    except Exception:
+        if attempt == MAX_RETRIES:
+            _bump("failed")
+            logger.exception("Giving up on mail to %s", message["recipient_list"])
+            return
+        _bump("retried")
+        not_before = time.monotonic() + RETRY_BACKOFF_SECONDS * 2 ** attempt
+        with _retries_lock:
+            heapq.heappush(_retries, (not_before, next(_retry_seq), attempt + 1, message))
+
+
+def _next_retry():
+    """
+    ``(attempt, message, 0)`` for a retry that is due, else
+    ``(None, None, wait)`` with the seconds until the next one is.
+    """
+    with _retries_lock:
+        if not _retries:
+            return None, None, IDLE_CLOSE_SECONDS
+        wait = _retries[0][0] - time.monotonic()
+        if wait > 0:
+            return None, None, min(wait, IDLE_CLOSE_SECONDS)
+        _, _, attempt, message = heapq.heappop(_retries)
+        return attempt, message, 0
+
+
+def _run_worker():
+    while True:
+        attempt, message, wait = _next_retry()
+        if message is not None:
+            _send_once(message, attempt)
+            continue
+        try:
+            message = _queue.get(timeout=wait)
+        except queue.Empty:
+            mailer.close_if_idle()
+            continue
+        try:
+            _send_once(message, 0)
+        finally:
+            _queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="mail-queue", daemon=True)
+            _worker.start()
+
+
+@atexit.register
+def _drain(timeout=10):
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+# ─────────────────────────────────────────────────────────────
+#  Public API
+# ─────────────────────────────────────────────────────────────
+def queue_mail(subject, message, recipient_list, from_email=None):
+    """
+    Queue a plain-text mail for delivery; never blocks on the mail server.
+    """
+    payload = {
+        "subject": subject,
+        "body": message,
+        "recipient_list": list(recipient_list),
+        "from_email": from_email,
+    }
+    backend = getattr(settings, "MAIL_QUEUE_BACKEND", "thread")
+
+    if backend == "sync":
+        _send_with_retries(payload)
+        return
+    if backend == "celery":
+        from .tasks import send_mail_task
+
+        send_mail_task.delay(payload)
+        _bump("queued")
+        return
+
+    _ensure_worker()
+    try:
+        _queue.put_nowait(payload)
+    except queue.Full:
+        _bump("dropped")
+        logger.error("Mail queue full; dropped mail to %s", recipient_list)
+        return
+    _bump("queued")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        data = dict(_stats)
+    data["pending"] = _queue.qsize()
+    with _retries_lock:
+        data["retry_pending"] = len(_retries)
+    return data
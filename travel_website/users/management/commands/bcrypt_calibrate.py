@@ -0,0 +1,39 @@
+import statistics
+import time
+
+import bcrypt
+from django.core.management.base import BaseCommand
+
+from users.hashing import configured_rounds
+
+
+class Command(BaseCommand):
+    """Pick the bcrypt cost factor that fits a latency budget on this host."""
+    help = "Measure bcrypt cost factors and suggest BCRYPT_ROUNDS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help="Latency budget for one hash, in milliseconds")
+        parser.add_argument('--min-rounds', type=int, default=10)
+        parser.add_argument('--max-rounds', type=int, default=16)
+        parser.add_argument('--samples', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        password = b"calibration-password-1"
+        best = opts['min_rounds']
+        for rounds in range(opts['min_rounds'], opts['max_rounds'] + 1):
+            timings = []
+            for _ in range(opts['samples']):
+                started = time.perf_counter()
+                bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+                timings.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(timings)
+            self.stdout.write(f"rounds={rounds:<3} {median:8.1f} ms")
+            if median > opts['target_ms']:
+                break
+            best = rounds
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Suggested: BCRYPT_ROUNDS = {best} (currently {configured_rounds()}). "
+            "Existing hashes are upgraded on next login."
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.sweeper import (
+    sweep_auth_state,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_LOGIN_LOG_RETENTION_DAYS,
+)
+
+
+class Command(BaseCommand):
+    """Delete expired sessions, stale reset tokens and old login logs."""
+    help = "Sweep expired auth state in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=getattr(settings, 'LOGIN_LOG_RETENTION_DAYS', DEFAULT_LOGIN_LOG_RETENTION_DAYS),
+            help="Keep LoginLog rows younger than this many days",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help="Seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **opts):
+        reports = sweep_auth_state(
+            batch_size=opts['batch_size'],
+            retention_days=opts['retention_days'],
+            pause=opts['pause'],
+        )
+        for r in reports:
+            self.stdout.write(self.style.SUCCESS(
+                f"{r['table']}: {r['rows']} rows in {r['seconds']}s "
+                f"({r['rows_per_sec']} rows/s)"
+            ))
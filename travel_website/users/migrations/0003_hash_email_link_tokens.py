@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:33
+
+import hashlib
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def hash_existing_tokens(apps, schema_editor):
+    """Replace raw tokens with their SHA-256 digests (same as helpers.hash_token)."""
+    User = apps.get_model('users', 'User')
+    pending = User.objects.filter(
+        Q(email_verification_token__isnull=False) | Q(reset_token__isnull=False)
+    ).only('id', 'email_verification_token', 'reset_token')
+    batch = []
+    for user in pending.iterator(chunk_size=1000):
+        for field in ('email_verification_token', 'reset_token'):
+            raw = getattr(user, field)
+            if raw:
+                setattr(user, field, hashlib.sha256(raw.encode()).hexdigest())
+        batch.append(user)
+        if len(batch) >= 1000:
+            User.objects.bulk_update(batch, ['email_verification_token', 'reset_token'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['email_verification_token', 'reset_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auth_sweep_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(hash_existing_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_verification_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='reset_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
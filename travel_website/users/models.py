@@ -18,11 +18,11 @@ class User(models.Model):
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
 
-    # email verification + reset
-    email_verification_token = models.TextField(null=True, blank=True)
+    # email verification + reset (SHA-256 hex digests, never the raw tokens)
+    email_verification_token = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     email_verified = models.BooleanField(default=False)
-    reset_token = models.TextField(null=True, blank=True)
-    reset_token_expiry = models.DateTimeField(null=True, blank=True)
+    reset_token = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    reset_token_expiry = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.username
@@ -34,7 +34,7 @@ class Session(models.Model):
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sessions")
     session_token = models.TextField(unique=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_persistent = models.BooleanField(default=False)
 
@@ -53,7 +53,36 @@ class LoginLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="login_logs")
     event_type = models.CharField(max_length=6, choices=EVENT_CHOICES)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set explicitly by the write-behind buffer (users/audit.py) at event time.
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"{self.user.username} | {self.event_type} | {self.timestamp:%Y-%m-%d %H:%M}"
+
+
+class RevokedToken(models.Model):
+    """
+    A logged-out signed session token (users/session_tokens.py), kept
+    until the token would have expired anyway.
+    """
+    jti = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="revoked_tokens")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id} | {self.jti}"
+
+
+class ThrottleBucket(models.Model):
+    """
+    Token-bucket state for users/throttling.py. ``full_at`` is when the
+    bucket will have refilled completely; past that the row is redundant
+    and the sweeper removes it.
+    """
+    key = models.CharField(max_length=80, unique=True)
+    tokens = models.FloatField()
+    updated = models.FloatField()                    # epoch seconds
+    full_at = models.FloatField(db_index=True)       # epoch seconds
+
+    def __str__(self):
+        return f"{self.key} | {self.tokens:.2f}"
@@ -0,0 +1,77 @@
+# users/session_cache.py
+"""
+Cache for resolved sessions.
+
+Resolved sessions live in the shared Django cache, in front of the
+Session table. There is deliberately no per-process tier: a logout or
+password reset deletes the shared entry, and every worker must stop
+accepting the session at once. Entries never outlive the session's own
+expiry, and a User save drops the entries of that user's sessions
+(users/signals.py).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+TTL_SECONDS = getattr(settings, "SESSION_CACHE_SHARED_TTL", 300)
+KEY_PREFIX = "sess:"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _bump(counter, n=1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+def _key(token: str) -> str:
+    # Never put raw session tokens into cache keys.
+    return KEY_PREFIX + hashlib.sha256(token.encode()).hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────
+#  Public API
+# ─────────────────────────────────────────────────────────────
+def get(token: str):
+    """
+    Return the cached user-info dict for *token*, or None on a miss.
+    """
+    info = cache.get(_key(token))
+    _bump("misses" if info is None else "hits")
+    return info
+
+
+def put(token: str, user_info: dict, expires_at):
+    """
+    Cache *user_info* for *token* until at most the session's expiry.
+    """
+    remaining = expires_at.timestamp() - time.time()
+    timeout = int(min(TTL_SECONDS, remaining))
+    if timeout > 0:
+        cache.set(_key(token), user_info, timeout=timeout)
+
+
+def invalidate(token: str):
+    invalidate_many([token])
+
+
+def invalidate_many(tokens):
+    keys = [_key(t) for t in tokens]
+    if keys:
+        cache.delete_many(keys)
+    _bump("invalidations", len(keys))
+
+
+def stats() -> dict:
+    """
+    Per-process hit/miss counters, used to size the cache.
+    """
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_ratio"] = data["hits"] / lookups if lookups else 0.0
+    return data
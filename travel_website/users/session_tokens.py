@@ -0,0 +1,147 @@
+# users/session_tokens.py
+"""
+Stateless session tokens.
+
+A token is a ``django.core.signing`` (HMAC over SECRET_KEY) payload that
+carries everything ``get_authenticated_user`` returns, so verifying it
+needs no database access on a warm cache. The username, email and admin
+flag it returns are read from the per-user state below, so account
+changes apply to tokens already issued. Revocations are stored in the
+database, where cache eviction cannot lose them:
+
+* logouts are RevokedToken rows, kept until the token would have expired;
+* a password change moves ``User.password_changed_at``, and tokens issued
+  before it are dead.
+
+Both are summarized per user under ``sess-state:v2:<id>`` in the shared
+cache, rewritten whenever the User row is saved (users/signals.py). A missing entry is reloaded from the database, never read as "not
+revoked", and a deleted or deactivated user has no valid tokens.
+"""
+import secrets
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import RevokedToken, User
+
+SALT = "users.session_tokens"
+STATE_KEY = "sess-state:v2:{}"
+STATE_TTL = 60 * 60
+
+
+def is_signed_token(token: str) -> bool:
+    """
+    Signed tokens contain ':' separators; random DB tokens never do.
+    """
+    return ":" in token
+
+
+def issue(user, expires_at, persistent: bool) -> str:
+    payload = {
+        "uid": user.id,
+        "usr": user.username,
+        "eml": user.email,
+        "adm": user.is_admin,
+        "exp": int(expires_at.timestamp()),
+        "pca": int(user.password_changed_at.timestamp()),
+        "per": persistent,
+        "jti": secrets.token_urlsafe(9),
+    }
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def verify(token: str):
+    """
+    Return the user-info dict for a valid, unrevoked token, else None.
+    """
+    try:
+        payload = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+
+    if time.time() >= payload["exp"]:
+        return None
+
+    state = _state(payload["uid"])
+    if state is None or payload["pca"] < state["pca"] or payload["jti"] in state["jtis"]:
+        return None
+
+    # Account fields come from the state, not the payload, so a demotion
+    # or rename applies to tokens already issued.
+    return {
+        "id":             payload["uid"],
+        "username":       state["usr"],
+        "email":          state["eml"],
+        "is_admin":       state["adm"],
+        "is_persistent":  payload["per"],
+    }
+
+
+def _load_state(user_id):
+    user = (User.objects.filter(pk=user_id, is_active=True)
+                .values("password_changed_at", "username", "email", "is_admin").first())
+    if user is None:
+        return None
+    jtis = RevokedToken.objects.filter(
+        user_id=user_id, expires_at__gt=timezone.now()
+    ).values_list("jti", flat=True)
+    return {
+        "pca": int(user["password_changed_at"].timestamp()),
+        "jtis": set(jtis),
+        "usr": user["username"],
+        "eml": user["email"],
+        "adm": user["is_admin"],
+    }
+
+
+def _state(user_id):
+    """
+    The user's revocation state and current account fields, or None if
+    the user is gone or inactive.
+    """
+    key = STATE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = _load_state(user_id)
+        # add, not set: never overwrite what a concurrent revoke just wrote.
+        cache.add(key, state or {"pca": None}, timeout=STATE_TTL)
+    elif state["pca"] is None:
+        return None
+    return state
+
+
+def refresh_state(user_id):
+    """
+    Rewrite the cached state from the database (after a revocation or
+    any change to the User row).
+    """
+    state = _load_state(user_id)
+    cache.set(STATE_KEY.format(user_id), state or {"pca": None}, timeout=STATE_TTL)
+
+
+def revoke(token: str):
+    """
+    Revoke one token (logout). The row lives only as long as the token.
+    """
+    try:
+        payload = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=dt_timezone.utc)
+    if expires_at <= timezone.now():
+        return
+    RevokedToken.objects.get_or_create(
+        jti=payload["jti"], defaults={"user_id": payload["uid"], "expires_at": expires_at},
+    )
+    refresh_state(payload["uid"])
+
+
+def revoke_user(user_id: int):
+    """
+    Revoke every token issued before the user's current password_changed_at
+    (already saved by the caller).
+    """
+    refresh_state(user_id)
@@ -0,0 +1,34 @@
+# users/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Session, User
+from . import session_cache, session_tokens
+
+
+def _session_tokens(user_id):
+    return list(Session.objects.filter(user_id=user_id).values_list("session_token", flat=True))
+
+
+# ─── Session state ────────────────────────────────────────
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Admin flag, active flag or password changed: signed tokens pick the
+    # new account state up on their next request.
+    user_id = instance.pk
+    transaction.on_commit(lambda: session_tokens.refresh_state(user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # Cached DB sessions carry user info (is_admin, email); drop them.
+    tokens = _session_tokens(instance.pk)
+    transaction.on_commit(lambda: session_cache.invalidate_many(tokens))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # The sessions are about to be cascaded away; collect them first.
+    tokens = _session_tokens(instance.pk)
+    transaction.on_commit(lambda: session_cache.invalidate_many(tokens))
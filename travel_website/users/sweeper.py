@@ -0,0 +1,122 @@
+# users/sweeper.py
+"""
+Batched cleanup of expired auth state.
+
+Rows are walked in keyset order on an indexed column ((column, id) > cursor)
+and removed in small batches. Each batch is its own short statement, so no
+lock is held across batches on tables the login path writes to.
+"""
+import time
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import User, Session, LoginLog, RevokedToken, ThrottleBucket
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_LOGIN_LOG_RETENTION_DAYS = 90
+
+
+def _keyset_batches(queryset, column, batch_size):
+    """
+    Yield lists of primary keys from *queryset*, ordered by (column, id).
+    """
+    cursor = None
+    while True:
+        page = queryset.order_by(column, "id")
+        if cursor is not None:
+            value, pk = cursor
+            page = page.filter(Q(**{f"{column}__gt": value}) | Q(**{column: value, "id__gt": pk}))
+        rows = list(page.values_list(column, "id")[:batch_size])
+        if not rows:
+            return
+        yield [pk for _, pk in rows]
+        cursor = rows[-1]
+
+
+def _run(name, batches, apply, pause):
+    started = time.monotonic()
+    total = 0
+    for ids in batches:
+        total += apply(ids)
+        if pause:
+            time.sleep(pause)
+    elapsed = time.monotonic() - started
+    return {
+        "table": name,
+        "rows": total,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(total / elapsed, 1) if elapsed else float(total),
+    }
+
+
+def sweep_sessions(now, batch_size, pause=0):
+    expired = Session.objects.filter(expires_at__lte=now)
+    return _run(
+        "sessions",
+        _keyset_batches(expired, "expires_at", batch_size),
+        lambda ids: Session.objects.filter(id__in=ids).delete()[0],
+        pause,
+    )
+
+
+def sweep_revoked_tokens(now, batch_size, pause=0):
+    expired = RevokedToken.objects.filter(expires_at__lte=now)
+    return _run(
+        "revoked_tokens",
+        _keyset_batches(expired, "expires_at", batch_size),
+        lambda ids: RevokedToken.objects.filter(id__in=ids).delete()[0],
+        pause,
+    )
+
+
+def sweep_throttle_buckets(now, batch_size, pause=0):
+    # A refilled bucket behaves exactly like a missing one.
+    full = ThrottleBucket.objects.filter(full_at__lte=now.timestamp())
+    return _run(
+        "throttle_buckets",
+        _keyset_batches(full, "full_at", batch_size),
+        lambda ids: ThrottleBucket.objects.filter(
+            id__in=ids, full_at__lte=now.timestamp()
+        ).delete()[0],
+        pause,
+    )
+
+
+def sweep_reset_tokens(now, batch_size, pause=0):
+    stale = User.objects.filter(reset_token__isnull=False, reset_token_expiry__lte=now)
+    return _run(
+        "reset_tokens",
+        _keyset_batches(stale, "reset_token_expiry", batch_size),
+        lambda ids: User.objects.filter(id__in=ids).update(
+            reset_token=None, reset_token_expiry=None
+        ),
+        pause,
+    )
+
+
+def sweep_login_logs(now, batch_size, retention_days, pause=0):
+    old = LoginLog.objects.filter(timestamp__lt=now - timedelta(days=retention_days))
+    return _run(
+        "login_logs",
+        _keyset_batches(old, "timestamp", batch_size),
+        lambda ids: LoginLog.objects.filter(id__in=ids).delete()[0],
+        pause,
+    )
+
+
+def sweep_auth_state(batch_size=DEFAULT_BATCH_SIZE,
+                     retention_days=DEFAULT_LOGIN_LOG_RETENTION_DAYS,
+                     pause=0):
+    """
+    Run every sweep and return one report dict per table.
+    """
+    now = timezone.now()
+    return [
+        sweep_sessions(now, batch_size, pause),
+        sweep_revoked_tokens(now, batch_size, pause),
+        sweep_throttle_buckets(now, batch_size, pause),
+        sweep_reset_tokens(now, batch_size, pause),
+        sweep_login_logs(now, batch_size, retention_days, pause),
+    ]
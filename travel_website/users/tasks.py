@@ -0,0 +1,31 @@
+# users/tasks.py
+from celery import shared_task
+from django.conf import settings
+
+from .sweeper import sweep_auth_state, DEFAULT_LOGIN_LOG_RETENTION_DAYS
+
+
+@shared_task
+def sweep_auth_state_task():
+    """Periodic cleanup of expired sessions, reset tokens and old login logs."""
+    return sweep_auth_state(
+        retention_days=getattr(
+            settings, "LOGIN_LOG_RETENTION_DAYS", DEFAULT_LOGIN_LOG_RETENTION_DAYS
+        ),
+    )
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    max_retries=getattr(settings, "MAIL_MAX_RETRIES", 5),
+)
+def send_mail_task(message):
+    """Deliver one queued mail over the worker's pooled connection."""
+    from .mail import mailer
+
+    try:
+        mailer.send(**message)
+    finally:
+        mailer.close_when_idle()
@@ -1,3 +1,240 @@
-from django.test import TestCase
+import queue
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail as outbox
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import audit, mail, session_cache, session_tokens, sweeper, throttling
+from .hashing import check_password
+from .helpers import create_session, get_authenticated_user, hash_token
+from .models import LoginLog, Session, User
+
+
+class SignedTokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='ana', email='ana@example.com',
+                                        password_hash='x')
+
+    def _token(self):
+        return session_tokens.issue(self.user, timezone.now() + timedelta(hours=1), False)
+
+    def test_logout_survives_cache_eviction(self):
+        token = self._token()
+        self.assertIsNotNone(session_tokens.verify(token))
+        session_tokens.revoke(token)
+        cache.clear()
+        self.assertIsNone(session_tokens.verify(token))
+
+    def test_password_change_survives_cache_eviction(self):
+        token = self._token()
+        self.assertIsNotNone(session_tokens.verify(token))
+        self.user.password_changed_at = timezone.now() + timedelta(seconds=1)
+        self.user.save(update_fields=['password_changed_at'])
+        session_tokens.revoke_user(self.user.id)
+        cache.clear()
+        self.assertIsNone(session_tokens.verify(token))
+
+    def test_inactive_user_has_no_valid_tokens(self):
+        token = self._token()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.assertIsNone(session_tokens.verify(token))
+
+
+class SessionCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='ana', email='ana@example.com',
+                                        password_hash='x', is_admin=True)
+        self.token = create_session(self.user)
+
+    def _resolve(self):
+        request = RequestFactory().get('/')
+        request.COOKIES['session_token'] = self.token
+        return get_authenticated_user(request)
+
+    def test_logout_is_seen_by_every_worker(self):
+        self.assertIsNotNone(self._resolve())
+        # What another worker's end_session() leaves behind: no row and no
+        # shared entry. Nothing private to this process may still match.
+        Session.objects.filter(session_token=self.token).delete()
+        cache.delete(session_cache._key(self.token))
+        self.assertIsNone(self._resolve())
+
+    def test_user_save_drops_cached_sessions(self):
+        self.assertTrue(self._resolve()['is_admin'])
+        self.user.is_admin = False
+        self.user.save()
+        self.assertFalse(self._resolve()['is_admin'])
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class ResetPasswordTests(TransactionTestCase):
+    def test_reset_hashes_off_thread_and_ends_sessions(self):
+        cache.clear()
+        user = User.objects.create(
+            username='ana', email='ana@example.com', password_hash='x',
+            reset_token=hash_token('t0k'),
+            reset_token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        token = create_session(user)
+        response = self.client.post('/reset-password/', {
+            'token': 't0k', 'password': 'N3w-passw0rd!', 'confirm_password': 'N3w-passw0rd!',
+        })
+        self.assertContains(response, 'reset successfully')
+        user.refresh_from_db()
+        self.assertTrue(check_password('N3w-passw0rd!', user.password_hash))
+        self.assertIsNone(user.reset_token)
+        self.assertFalse(Session.objects.filter(session_token=token).exists())
+
+
+class SignedTokenAccountChangeTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='ana', email='ana@example.com',
+                                        password_hash='x', is_admin=True)
+        self.token = session_tokens.issue(
+            self.user, timezone.now() + timedelta(days=7), True)
+        self.assertTrue(session_tokens.verify(self.token)['is_admin'])
+
+    def test_demotion_applies_to_issued_tokens(self):
+        self.user.is_admin = False
+        self.user.save()
+        self.assertFalse(session_tokens.verify(self.token)['is_admin'])
+
+    def test_deactivation_applies_to_issued_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(session_tokens.verify(self.token))
+
+
+@override_settings(THROTTLE_RATES={'test': (5, 60)})
+class ThrottleTests(TransactionTestCase):
+    def test_bucket_is_exhausted_after_capacity(self):
+        results = [throttling.allow('test', '203.0.113.9') for _ in range(8)]
+        self.assertEqual(results, [True] * 5 + [False] * 3)
+        self.assertTrue(throttling.allow('test', '203.0.113.10'))
+
+    def test_bucket_refills_over_time(self):
+        for _ in range(5):
+            throttling.allow('test', '203.0.113.9')
+        later = time.time() + 24    # 2 tokens at 5 per 60 s
+        with mock.patch('users.throttling.time.time', return_value=later):
+            results = [throttling.allow('test', '203.0.113.9') for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+
+    def test_concurrent_burst_gets_capacity_only(self):
+        results = []
+        def hit():
+            try:
+                results.append(throttling.allow('test', '203.0.113.9'))
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results.count(True), 5)
+
+    def test_sweeper_drops_refilled_buckets(self):
+        throttling.allow('test', '203.0.113.9')
+        later = timezone.now() + timedelta(minutes=1)
+        self.assertEqual(sweeper.sweep_throttle_buckets(later, 100)['rows'], 1)
+
+
+class MailRetryQueueTests(TestCase):
+    message = {'subject': 'Hi', 'body': 'Hello', 'recipient_list': ['ana@example.com'],
+               'from_email': None}
+
+    def setUp(self):
+        self.addCleanup(mail._retries.clear)
+        patcher = mock.patch('users.mail.RETRY_BACKOFF_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_send_is_retried_later_not_inline(self):
+        results = iter([OSError('connection reset')])
+        real_send = mail.mailer.send
+
+        def flaky_send(**message):
+            error = next(results, None)
+            if error:
+                raise error
+            real_send(**message)
+
+        with mock.patch.object(mail.mailer, 'send', side_effect=flaky_send) as send:
+            mail._send_once(self.message, 0)
+            self.assertEqual(send.call_count, 1)
+            attempt, message, wait = mail._next_retry()
+            self.assertEqual((attempt, message, wait), (1, self.message, 0))
+            mail._send_once(message, attempt)
+        self.assertEqual(len(outbox.outbox), 1)
+        self.assertEqual(mail._next_retry()[1], None)
+
+    def test_gives_up_after_max_retries(self):
+        failed = mail.stats()['failed']
+        with mock.patch.object(mail.mailer, 'send', side_effect=OSError):
+            mail._send_once(self.message, mail.MAX_RETRIES)
+        self.assertEqual(mail.stats()['failed'], failed + 1)
+        self.assertEqual(mail.stats()['retry_pending'], 0)
+
+    @mock.patch('users.mail.IDLE_CLOSE_SECONDS', 0.05)
+    def test_celery_task_closes_idle_connection(self):
+        from .tasks import send_mail_task
+
+        mailer = mail.PooledMailer()
+        with mock.patch('users.mail.mailer', mailer):
+            send_mail_task(self.message)
+        self.assertIsNotNone(mailer._connection)
+        time.sleep(0.2)
+        self.assertIsNone(mailer._connection)
+        self.assertEqual(len(outbox.outbox), 1)
+
+
+class AuditBufferTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ana', email='ana@example.com',
+                                        password_hash='x')
+        self.buffer = queue.Queue(maxsize=3)
+        for patcher in (mock.patch('users.audit._queue', self.buffer),
+                        mock.patch('users.audit.FLUSH_SIZE', 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_events_wait_in_memory_until_flushed(self):
+        with mock.patch('users.audit._ensure_flusher'):
+            audit.record(self.user.id, LoginLog.LOGIN, '203.0.113.9')
+            audit.record(self.user.id, LoginLog.LOGOUT, 'not-an-ip')
+            audit.record(self.user.id, LoginLog.LOGIN)
+            self.assertFalse(LoginLog.objects.exists())
+            flushes = audit.stats()['flushes']
+            self.assertEqual(audit.flush(), 3)
+        self.assertEqual(audit.stats()['flushes'], flushes + 2)   # batches of FLUSH_SIZE
+        self.assertEqual(
+            list(LoginLog.objects.order_by('timestamp').values_list('event_type', 'ip_address')),
+            [('login', '203.0.113.9'), ('logout', None), ('login', None)])
+
+    def test_full_buffer_drops_new_events(self):
+        dropped = audit.stats()['dropped']
+        with mock.patch('users.audit._ensure_flusher'):
+            for _ in range(5):
+                audit.record(self.user.id, LoginLog.LOGIN)
+        self.assertEqual(audit.stats()['dropped'], dropped + 2)
+        self.assertEqual(audit.flush(), 3)
+
+    def test_flusher_wakes_at_flush_size(self):
+        audit.record(self.user.id, LoginLog.LOGIN)
+        audit.record(self.user.id, LoginLog.LOGOUT)
+        deadline = time.monotonic() + 2
+        while LoginLog.objects.count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(LoginLog.objects.count(), 2)
@@ -0,0 +1,104 @@
+# users/throttling.py
+"""
+Token-bucket throttling backed by the database.
+
+Each bucket holds up to ``capacity`` tokens and refills at
+``capacity / period`` tokens per second. A request spends one token;
+an empty bucket means the request is rejected before any bcrypt or mail
+work happens.
+
+Buckets are ThrottleBucket rows. Refill and spend are a single
+conditional UPDATE, so concurrent requests from any number of workers
+serialize on the row and a parallel burst cannot spend the same tokens
+twice; this holds on every database, unlike the cache backends, where
+only Redis has atomic read-modify-write. The allowed/rejected counters
+are per process.
+"""
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Least
+
+from .models import ThrottleBucket
+
+# name: (capacity, period in seconds)
+DEFAULT_RATES = {
+    "login_ip":          (30, 60),
+    "login_identifier":  (10, 15 * 60),
+    "mail_ip":           (5, 60 * 60),
+    "mail_address":      (3, 60 * 60),
+}
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _rate(bucket: str):
+    rates = {**DEFAULT_RATES, **getattr(settings, "THROTTLE_RATES", {})}
+    return rates[bucket]
+
+
+def _count(bucket: str, outcome: str):
+    with _stats_lock:
+        counters = _stats.setdefault(bucket, {"allowed": 0, "rejected": 0})
+        counters[outcome] += 1
+
+
+def _spend(key: str, capacity: int, refill_per_sec: float, now: float) -> bool:
+    """
+    Refill the bucket up to *now* and take one token, in one statement.
+    """
+    tokens = Least(Value(float(capacity)),
+                   F("tokens") + (Value(now) - F("updated")) * Value(refill_per_sec))
+    return bool(
+        ThrottleBucket.objects
+            .alias(available=tokens)
+            .filter(key=key, available__gte=1)
+            .update(
+                tokens=tokens - 1,
+                updated=Value(now),
+                full_at=Value(now) + (Value(float(capacity)) - tokens + 1) / Value(refill_per_sec),
+            )
+    )
+
+
+def allow(bucket: str, key: str) -> bool:
+    """
+    Spend one token from *bucket* for *key*; False when the bucket is empty.
+    """
+    capacity, period = _rate(bucket)
+    refill_per_sec = capacity / period
+    bucket_key = f"{bucket}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    now = time.time()
+    allowed = _spend(bucket_key, capacity, refill_per_sec, now)
+    if not allowed:
+        # No row yet (or an empty bucket): create a full one if missing.
+        ThrottleBucket.objects.bulk_create(
+            [ThrottleBucket(key=bucket_key, tokens=capacity, updated=now, full_at=now)],
+            ignore_conflicts=True,
+        )
+        allowed = _spend(bucket_key, capacity, refill_per_sec, now)
+
+    _count(bucket, "allowed" if allowed else "rejected")
+    return allowed
+
+
+def allow_all(*checks) -> bool:
+    """
+    Check ``(bucket, key)`` pairs in order, stopping at the first rejection
+    so later buckets are not charged for a request that is turned away.
+    """
+    return all(allow(bucket, key) for bucket, key in checks if key)
+
+
+aallow_all = sync_to_async(allow_all)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {bucket: dict(counters) for bucket, counters in _stats.items()}
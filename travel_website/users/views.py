@@ -1,33 +1,50 @@
 # users/views.py
 from datetime import timedelta
 import secrets
-import bcrypt
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.http import HttpResponseRedirect, Http404
-from django.core.mail import send_mail
+from django.http import HttpResponseRedirect, Http404, JsonResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.db import IntegrityError
+from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect
 from destinations.models import Destination        # ← import your model
+from destinations import storage as media_storage
+from travel_site import cache as two_tier_cache
 
 
 from .models import User
+from . import audit, session_cache, throttling
+from . import mail
+from .mail import queue_mail
+from .hashing import (
+    ahash_password,
+    acheck_password,
+    needs_rehash,
+)
 
 from .helpers import (
     get_authenticated_user,
+    aget_authenticated_user,
     create_session,
+    end_session,
+    end_all_sessions,
+    forget_authenticated_user,
+    admin_required,
     SESSION_DURATION_MINUTES,
     PERSISTENT_SESSION_DURATION_DAYS,
     is_valid_password,
+    hash_token,
     log_auth_event,
 )
 
 # ─────────────────────────────────────────────────────────────
 #  Registration
 # ─────────────────────────────────────────────────────────────
-def register_view(request):
+async def register_view(request):
     if request.method == "POST":
         username = request.POST.get("username", "").strip()
         email = request.POST.get("email", "").strip()
@@ -45,14 +62,14 @@ def register_view(request):
             return render(request, "register.html", {"error": msg})
 
         email_token = secrets.token_urlsafe(24)
-        password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        password_hash = await ahash_password(password)
 
         try:
-            User.objects.create(
+            await User.objects.acreate(
                 username=username,
                 email=email,
                 password_hash=password_hash,
-                email_verification_token=email_token,
+                email_verification_token=hash_token(email_token),
                 password_changed_at=timezone.now(),
             )
         except IntegrityError:
@@ -63,12 +80,10 @@ def register_view(request):
             )
 
         verification_link = f"http://{request.get_host()}/verify-email?token={email_token}"
-        send_mail(
+        queue_mail(
             subject="Please verify your email address",
             message=f"Hi {username},\n\nVerify here:\n{verification_link}",
-            from_email=None,
             recipient_list=[email],
-            fail_silently=False,
         )
         return render(
             request,
@@ -88,7 +103,7 @@ def verify_email_view(request):
         return render(request, "verify_email.html", {"error": "Missing token."})
 
     try:
-        user = User.objects.get(email_verification_token=token)
+        user = User.objects.get(email_verification_token=hash_token(token))
     except User.DoesNotExist:
         return render(request, "verify_email.html", {"error": "Invalid token."})
 
@@ -111,8 +126,24 @@ def verify_email_view(request):
 # ─────────────────────────────────────────────────────────────
 #  Login + Logout
 # ─────────────────────────────────────────────────────────────
-def login_view(request):
-    if get_authenticated_user(request):
+def _client_ip(request):
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+async def _find_user(identifier: str):
+    """
+    Resolve a username or email with one query; a username match wins.
+    """
+    match = None
+    async for user in User.objects.filter(Q(username=identifier) | Q(email=identifier))[:2]:
+        if user.username == identifier:
+            return user
+        match = user
+    return match
+
+
+async def login_view(request):
+    if await aget_authenticated_user(request):
         return redirect("/home/")
 
     if request.method == "POST":
@@ -123,19 +154,33 @@ def login_view(request):
         if not identifier or not password:
             return render(request, "login.html", {"error": "All fields are required"})
 
-        try:
-            user = User.objects.get(username=identifier)
-        except User.DoesNotExist:
-            try:
-                user = User.objects.get(email=identifier)
-            except User.DoesNotExist:
-                return render(request, "login.html", {"error": "User not found"})
+        if not await throttling.aallow_all(
+            ("login_ip", _client_ip(request)),
+            ("login_identifier", identifier.lower()),
+        ):
+            return render(
+                request,
+                "login.html",
+                {"error": "Too many login attempts. Please try again later."},
+                status=429,
+            )
 
-        if not bcrypt.checkpw(password.encode(), user.password_hash.encode()):
+        user = await _find_user(identifier)
+        if user is None:
+            return render(request, "login.html", {"error": "User not found"})
+
+        if not await acheck_password(password, user.password_hash):
             return render(request, "login.html", {"error": "Incorrect password"})
 
-        token = create_session(user.id, persistent=remember_me)
-        log_auth_event(user.id, "login", request.META.get("REMOTE_ADDR", "unknown"))
+        # Upgrade hashes made with an outdated cost factor.
+        if needs_rehash(user.password_hash):
+            user.password_hash = await ahash_password(password)
+            await user.asave(update_fields=["password_hash"])
+
+        token = await sync_to_async(create_session)(user, persistent=remember_me)
+        await sync_to_async(log_auth_event)(
+            user.id, "login", request.META.get("REMOTE_ADDR", "unknown")
+        )
 
         max_age = (
             PERSISTENT_SESSION_DURATION_DAYS * 24 * 60 * 60
@@ -165,9 +210,8 @@ def logout_view(request):
         log_auth_event(user["id"], "logout", request.META.get("REMOTE_ADDR", "unknown"))
 
     if token:
-        from .models import Session
-
-        Session.objects.filter(session_token=token).delete()
+        end_session(token)
+        forget_authenticated_user(request)
         resp.delete_cookie("session_token")
 
     return resp
@@ -190,6 +234,19 @@ def home_view(request):
         "destinations": destinations,           # ← pass into context
     })
 
+def user_header_view(request):
+    """
+    The per-user header of the public destination pages. Those pages are
+    shared-cacheable, so this fragment is fetched separately and is
+    private to the browser.
+    """
+    resp = render(request, "_user_header.html", {
+        "user": get_authenticated_user(request),
+    })
+    patch_cache_control(resp, private=True, no_cache=True)
+    patch_vary_headers(resp, ["Cookie"])
+    return resp
+
 # ─────────────────────────────────────────────────────────────
 #  Forgot Password
 # ─────────────────────────────────────────────────────────────
@@ -199,6 +256,17 @@ def forgot_password_view(request):
         if not email:
             return render(request, "forgot_password.html", {"error": "Email is required."})
 
+        if not throttling.allow_all(
+            ("mail_ip", _client_ip(request)),
+            ("mail_address", email.lower()),
+        ):
+            return render(
+                request,
+                "forgot_password.html",
+                {"error": "Too many requests. Please try again later."},
+                status=429,
+            )
+
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
@@ -216,15 +284,14 @@ def forgot_password_view(request):
         reset_token = secrets.token_urlsafe(32)
         expiry_time = timezone.now() + timedelta(minutes=30)
 
-        user.reset_token = reset_token
+        user.reset_token = hash_token(reset_token)
         user.reset_token_expiry = expiry_time
         user.save(update_fields=["reset_token", "reset_token_expiry"])
 
         reset_link = f"http://{request.get_host()}/reset-password?token={reset_token}"
-        send_mail(
+        queue_mail(
             "Password Reset - TravelSite",
             f"Hi {user.username},\n\nReset here (30 min):\n{reset_link}",
-            None,
             [email],
         )
 
@@ -240,13 +307,13 @@ def forgot_password_view(request):
 # ─────────────────────────────────────────────────────────────
 #  Reset Password
 # ─────────────────────────────────────────────────────────────
-def reset_password_view(request):
+async def reset_password_view(request):
     token = request.GET.get("token") or request.POST.get("token")
     if not token:
         return render(request, "reset_password.html", {"error": "Missing reset token."})
 
     try:
-        user = User.objects.get(reset_token=token)
+        user = await User.objects.aget(reset_token=hash_token(token))
     except User.DoesNotExist:
         return render(request, "reset_password.html", {"error": "Invalid or expired token."})
 
@@ -275,12 +342,12 @@ def reset_password_view(request):
                 {"error": msg, "token": token},
             )
 
-        pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        pw_hash = await ahash_password(password)
         user.password_hash = pw_hash
         user.password_changed_at = timezone.now()
         user.reset_token = None
         user.reset_token_expiry = None
-        user.save(
+        await user.asave(
             update_fields=[
                 "password_hash",
                 "password_changed_at",
@@ -288,6 +355,8 @@ def reset_password_view(request):
                 "reset_token_expiry",
             ]
         )
+        # A reset must log the account out everywhere, cached sessions included.
+        await sync_to_async(end_all_sessions)(user)
 
         return render(
             request,
@@ -305,10 +374,17 @@ def reset_password_view(request):
 @csrf_exempt
 def resend_verification_view(request):
     context = {}
+    status = 200
     if request.method == "POST":
         email = request.POST.get("email", "").strip()
         if not email:
             context["error"] = "Please enter your email."
+        elif not throttling.allow_all(
+            ("mail_ip", _client_ip(request)),
+            ("mail_address", email.lower()),
+        ):
+            context["error"] = "Too many requests. Please try again later."
+            status = 429
         else:
             try:
                 user = User.objects.get(email=email)
@@ -319,16 +395,30 @@ def resend_verification_view(request):
                     context["message"] = "Your email is already verified."
                 else:
                     new_token = secrets.token_urlsafe(24)
-                    user.email_verification_token = new_token
+                    user.email_verification_token = hash_token(new_token)
                     user.save(update_fields=["email_verification_token"])
 
                     link = f"http://{request.get_host()}/verify-email?token={new_token}"
-                    send_mail(
+                    queue_mail(
                         "Your verification link",
                         f"Hi {user.username},\n\nClick to verify:\n{link}",
-                        None,
                         [email],
                     )
                     context["message"] = "✅ Verification email resent—check your inbox."
 
-    return render(request, "resend_verification.html", context)
+    return render(request, "resend_verification.html", context, status=status)
+
+
+# ─────────────────────────────────────────────────────────────
+#  Internal stats (admin only, per worker process)
+# ─────────────────────────────────────────────────────────────
+@admin_required
+def internal_stats_view(request):
+    return JsonResponse({
+        "session_cache": session_cache.stats(),
+        "throttle": throttling.stats(),
+        "mail": mail.stats(),
+        "audit": audit.stats(),
+        "two_tier_cache": two_tier_cache.stats(),
+        "media_storage": media_storage.stats(),
+    })